@@ -10,7 +10,7 @@ app = Flask(__name__)
 
 @app.route("/reddit/get_modqueue/<string:subreddit_name>")
 def reddit_get_modqueue(subreddit_name):
-    queue_items = list(rw.scrape_modqueue(subreddit_name))
+    queue_items = rw.get_modqueue(subreddit_name)
 
     to_return = {}
 
@@ -5,15 +5,20 @@ import sys
 import modbot.ytaccess as yt
 from modbot.log import add_discord_webhook
 from modbot.plugin import plugin_manager
-from modbot.reddit_wrapper import set_credentials, set_input_type, set_signature
+from modbot.reddit_wrapper import set_credentials, set_input_type, set_signature, set_feeder_opts, \
+    set_cache_opts
 from modbot.api import start_server
+from modbot.storage import set_write_behind, set_storage_backend, \
+    set_storage_serializer, set_lazy_cache_size
+from modbot.executor import set_executor_opts
 
 class bot():
-    def __init__(self, bot_config_path, backend="reddit"):
+    def __init__(self, bot_config_path, backend=None):
         """
         Create a bot instance.
         :param bot_config_path: path for the bot config file
-        :param backend: what backend to use to get submissions/comments
+        :param backend: what backend to use to get submissions/comments,
+            defaults to the input set in the config file or reddit
         """
 
         if not os.path.isfile(bot_config_path):
@@ -24,7 +29,36 @@ class bot():
         self.config = configparser.ConfigParser()
         self.config.read(bot_config_path)
 
-        # Set how data is fetched (either live from reddit or from a test framework)
+        # Storage settings are optional - check if present
+        if "storage" in self.config.sections():
+            write_behind = self.config.getint(
+                "storage", "write_behind", fallback=0)
+            if write_behind > 0:
+                set_write_behind(write_behind)
+
+            set_storage_backend(self.config.get(
+                "storage", "backend", fallback="json"))
+            set_storage_serializer(self.config.get(
+                "storage", "serializer", fallback="pretty"))
+            set_lazy_cache_size(self.config.getint(
+                "storage", "lazy_cache_size", fallback=1000))
+
+        # Feeder limits are optional
+        if "feeder" in self.config.sections():
+            set_feeder_opts(self.config["feeder"])
+
+        # Item cache settings are optional
+        if "cache" in self.config.sections():
+            set_cache_opts(self.config["cache"])
+
+        # Plugin executor limits are optional
+        if "executor" in self.config.sections():
+            set_executor_opts(self.config["executor"])
+
+        # Set how data is fetched (either live from reddit or from a test
+        # framework). An explicit backend wins over the config file.
+        if backend is None:
+            backend = self.config.get("config", "input", fallback="reddit")
         set_input_type(backend)
 
         # Set PRAW options
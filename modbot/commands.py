@@ -3,8 +3,8 @@ import pathlib
 from modbot import hook
 from modbot.log import botlog
 from modbot.reddit_wrapper import get_moderator_users
-from modbot.utils import BotThread
-from modbot.storage import get_stored_dict
+from modbot import executor
+from modbot.storage import get_stored_dict, deferred_writes
 
 inbox_cmd_list = {}
 report_cmd_list = {}
@@ -99,22 +99,26 @@ def _call_target(target, message, avail_args):
         call_args[req] = avail_args[req]
 
     try:
-        target.func(**call_args)
+        with deferred_writes():
+            target.func(**call_args)
     except:
         import traceback
         traceback.print_exc()
 
 
-def call_target(target, message, plugin_args):
+def call_target(target, message, plugin_args, inline=False):
     """
-    Launch a thread for each plugin
+    Run the command in the plugin executor, or in the current thread if
+    inline is set
     """
-    BotThread(_call_target,
-              "inbox_plugin",
-              (target, message, plugin_args,))
+    if inline:
+        _call_target(target, message, plugin_args)
+    else:
+        executor.submit(target.plugin_name, _call_target,
+                        target, message, plugin_args)
 
 
-def execute_list(item, plugin_args, cmd_list):
+def execute_list(item, plugin_args, cmd_list, inline=False):
     # Get the body
     text = item.body
 
@@ -146,7 +150,7 @@ def execute_list(item, plugin_args, cmd_list):
     plugin_args["cmd_args"] = cmd_args
     # Run raw commands first
     for raw in raw_cmd_list.values():
-        call_target(raw, item, plugin_args)
+        call_target(raw, item, plugin_args, inline)
 
     # Run target command
     if not is_raw and text in cmd_list:
@@ -158,7 +162,7 @@ def execute_list(item, plugin_args, cmd_list):
             plugin_args["storage"] = get_stored_dict(
                 "all", cmd_list[text].plugin_name)
 
-            call_target(cmd_list[text], item, plugin_args)
+            call_target(cmd_list[text], item, plugin_args, inline)
         else:
             logger.error(
                 "User %s tried running unprivileged command %s" % (item.author, text))
@@ -177,7 +181,9 @@ def execute_inbox_command(message, plugin_args):
     args["is_report"] = False
     args["message"] = message
     args["event"] = message
-    execute_list(message, args, inbox_cmd_list)
+    # Inbox commands already run in the inbox pool, where the messages of
+    # an author are run in order
+    execute_list(message, args, inbox_cmd_list, inline=True)
 
 
 def get_rights_for_user(user, bot_owner):
@@ -0,0 +1,177 @@
+import collections
+import threading
+from modbot.log import botlog
+from modbot.utils import BotThreadPool
+from modbot.ratelimit import current_priority, request_priority
+from modbot.storage import deferred_writes
+
+logger = botlog("executor")
+
+executor_opts = {
+    # Threads shared by all plugins
+    "workers": 16,
+    # Tasks of one plugin that can run at the same time
+    "per_plugin": 4,
+    # Tasks of one plugin that can wait to be run
+    "max_queued": 100,
+    # Seconds to wait for room in a full queue before dropping the task
+    "block_timeout": 30,
+}
+
+executor = None
+executor_lock = threading.Lock()
+
+
+class PluginQueue():
+    """
+    Tasks of one plugin and their counters
+    """
+
+    def __init__(self):
+        self.pending = collections.deque()
+        self.running = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.dropped = 0
+
+        # Keys of the tasks that are queued or running, see submit()
+        self.active_keys = set()
+
+
+class PluginExecutor():
+    """
+    Runs plugin code, such as commands and periodic hooks, in one bounded
+    thread pool.
+
+    At most per_plugin tasks of a plugin run at the same time and the
+    others wait in the queue of that plugin, so a slow plugin can't take
+    all the workers. When a queue holds max_queued tasks, submit() blocks
+    until there is room, which slows down whoever is adding the work. If
+    there is no room after block_timeout seconds, the task is dropped.
+
+    Tasks run with the request priority of the thread that submitted them.
+    """
+
+    def __init__(self, workers, per_plugin, max_queued, block_timeout):
+        self.per_plugin = per_plugin
+        self.max_queued = max_queued
+        self.block_timeout = block_timeout
+
+        self.pool = BotThreadPool(workers, "plugin")
+        self.cond = threading.Condition()
+        self.queues = {}
+
+    def submit(self, plugin_name, target, *args, block=True, key=None):
+        """
+        Queue a call for a plugin
+        :param block: wait for room in a full queue; without it, the task is
+            dropped right away
+        :param key: drop the task if one with the same key is still queued
+            or running, e.g. for periodic calls that would only pile up
+        :return: False if the task was dropped
+        """
+        level = current_priority()
+        with self.cond:
+            queue = self.queues.setdefault(plugin_name, PluginQueue())
+
+            if key is not None and key in queue.active_keys:
+                queue.dropped += 1
+                return False
+
+            if not self.cond.wait_for(lambda: len(queue.pending) < self.max_queued,
+                                      self.block_timeout if block else 0):
+                queue.dropped += 1
+                logger.error("Queue of %s is full, dropping %s" %
+                             (plugin_name, target))
+                return False
+
+            if key is not None:
+                queue.active_keys.add(key)
+            queue.pending.append((target, args, level, key))
+            queue.max_queued = max(queue.max_queued, len(queue.pending))
+            to_start = self.next_tasks(queue)
+
+        self.start(plugin_name, to_start)
+        return True
+
+    def next_tasks(self, queue):
+        """
+        Take the tasks that can be started now; called with the lock held
+        """
+        to_start = []
+        while queue.pending and queue.running < self.per_plugin:
+            to_start.append(queue.pending.popleft())
+            queue.running += 1
+
+        if to_start:
+            self.cond.notify_all()
+
+        return to_start
+
+    def start(self, plugin_name, tasks):
+        for task in tasks:
+            self.pool.submit(self.run, plugin_name, *task)
+
+    def run(self, plugin_name, target, args, level, key):
+        try:
+            # Storage changed by the task is written once, when it ends
+            with request_priority(level), deferred_writes():
+                target(*args)
+        except:
+            import traceback
+            traceback.print_exc()
+        finally:
+            with self.cond:
+                queue = self.queues[plugin_name]
+                queue.running -= 1
+                queue.completed += 1
+                queue.active_keys.discard(key)
+                to_start = self.next_tasks(queue)
+
+            self.start(plugin_name, to_start)
+
+    def stats(self):
+        """
+        Return the queue depth and counters of each plugin
+        """
+        with self.cond:
+            return {
+                plugin_name: {
+                    "running": queue.running,
+                    "queued": len(queue.pending),
+                    "max_queued": queue.max_queued,
+                    "completed": queue.completed,
+                    "dropped": queue.dropped}
+                for plugin_name, queue in self.queues.items()}
+
+
+def get_executor():
+    global executor
+
+    with executor_lock:
+        if not executor:
+            executor = PluginExecutor(**executor_opts)
+
+    return executor
+
+
+def submit(plugin_name, target, *args, block=True, key=None):
+    """
+    Run a plugin function in the shared executor
+    """
+    return get_executor().submit(plugin_name, target, *args, block=block, key=key)
+
+
+def get_executor_stats():
+    return get_executor().stats()
+
+
+def set_executor_opts(opts):
+    """
+    Set the size of the plugin executor and the limits of each plugin
+    """
+    for name, value in opts.items():
+        if name not in executor_opts:
+            raise ValueError("Invalid executor option %s" % name)
+
+        executor_opts[name] = int(value)
@@ -63,6 +63,12 @@ class plugin_function():
         # Mark whether it's a raw command hook
         self.raw = False
 
+        # Optional function that tells if a hook currently wants items
+        self.active = None
+
+        # Modqueue hooks that only want new or changed items
+        self.changed_only = False
+
         # Set the default permission level
         self.permission = permission.ANY
 
@@ -93,6 +99,12 @@ class plugin_function():
             if "raw" in kwargs:
                 self.raw = kwargs["raw"]
 
+            if "active" in kwargs:
+                self.active = kwargs["active"]
+
+            if ctype == callback_type.MQU and "changed_only" in kwargs:
+                self.changed_only = kwargs["changed_only"]
+
             if "permission" in kwargs and kwargs["permission"] in permission:
                 self.permission = kwargs["permission"]
 
@@ -330,7 +342,8 @@ def modlog(*args, **kwargs):
 
 def modqueue(*args, **kwargs):
     """
-    modqueue hook
+    modqueue hook, called with every item of the queue on each pass. Hooks
+    that set changed_only only get the items that are new or changed.
     """
     def _command_hook(func):
         add_plugin_function(plugin_function(
@@ -38,6 +38,10 @@ def get_reddit(name="default", force_create=False):
     return reddit()
 
 
+def get_rate_limit():
+    return None
+
+
 def thread_sub(feeder):
     pass
 
@@ -5,6 +5,7 @@ import requests
 import json
 from modbot.log import botlog, loglevel
 from modbot.utils import utcnow, timedata
+from modbot.ratelimit import scheduler, priority, set_thread_priority
 
 praw_credentials = None
 praw_user_agent = None
@@ -23,6 +24,19 @@ class Thing():
         self.id = id
 
 
+class ScheduledRequestor(prawcore.Requestor):
+    """
+    Sends each request through the shared rate limit scheduler
+    """
+
+    def request(self, *args, **kwargs):
+        scheduler.acquire()
+        response = super().request(*args, **kwargs)
+        scheduler.update_from_headers(response.headers)
+
+        return response
+
+
 def set_praw_opts(credentials, user_agent):
     """
     Set authentication options
@@ -57,7 +71,10 @@ def get_reddit(name="default", force_create=False):
         inst = None
         if praw_credentials and praw_user_agent:
             logger.debug("Creating PRAW instance")
-            inst = praw.Reddit(praw_credentials, user_agent=praw_user_agent)
+            inst = praw.Reddit(
+                praw_credentials,
+                user_agent=praw_user_agent,
+                requestor_class=ScheduledRequestor)
         else:
             raise ValueError("PRAW credentials not set")
 
@@ -74,6 +91,14 @@ def get_reddit(name="default", force_create=False):
     return praw_inst[name]
 
 
+def get_rate_limit():
+    """
+    Returns the fraction of the rate limit that is still available or None
+    if it's not known yet
+    """
+    return scheduler.headroom()
+
+
 def thread_sub(feeder):
     """
     Watch submissions and trigger submission events
@@ -85,6 +110,8 @@ def thread_sub(feeder):
         except:
             return None
 
+    set_thread_priority(priority.CATCH_UP)
+
     first_set = False
     logger.debug("Getting base submission")
     # Get one submission and set it as the initial one
@@ -99,8 +126,8 @@ def thread_sub(feeder):
             time.sleep(1)
 
     while True:
-        # Do this every 30s
-        time.sleep(30)
+        # Wait more when there are fewer new submissions
+        time.sleep(feeder.probe_interval)
 
         # Feed all submissions
         #sub_id = get_reddit_object("https://www.reddit.com/r/all/new.json")
@@ -112,17 +139,23 @@ def thread_sub(feeder):
 
 def thread_comm(feeder):
     """
-    Watch comments and trigger comments events
+    Watch comments and trigger comments events. The feeder has a request
+    budget, so only part of the comments are fetched when there are many.
     """
+    def get_item():
+        try:
+            for comm in get_reddit().subreddit("all").comments(limit=1):
+                return comm.id
+        except:
+            return None
+
+    set_thread_priority(priority.CATCH_UP)
 
-    # Disabled for now, as it caused the bot to do to many requests
-    return
     first_set = False
     logger.debug("Getting base comment")
     # Get one comment and set it as the initial one
     while not first_set:
-        comm_id = get_reddit_object(
-            "https://www.reddit.com/r/all/comments.json")
+        comm_id = get_item()
         if comm_id:
             feeder.set_initial(Thing(comm_id))
             first_set = True
@@ -130,31 +163,23 @@ def thread_comm(feeder):
             time.sleep(1)
 
     while True:
-        # Do this every 10s
-        time.sleep(10)
+        # Wait more when there are fewer new comments
+        time.sleep(feeder.probe_interval)
 
-        # Feed all submissions
-        comm_id = get_reddit_object(
-            "https://www.reddit.com/r/all/comments.json")
-        feeder.new_all_object(Thing(comm_id))
+        comm_id = get_item()
+        if comm_id:
+            idfeeder.debug("Feeding comment ID %s" % comm_id)
+            feeder.new_all_object(Thing(comm_id))
 
 
-def thread_reports(new_report):
+def thread_reports(scan_func):
     """
-    Watch reports and trigger events
+    Read the reports of all moderated subreddits periodically
     """
+    set_thread_priority(priority.REPORTS)
     while True:
-        session = get_reddit()
         try:
-            # Feed all reports
-            for reported_item in session.subreddit("mod").mod.reports():
-                for mod_report in reported_item.mod_reports:
-                    new_report(reported_item, mod_report[1], mod_report[0])
-
-        except (praw.exceptions.PRAWException, prawcore.exceptions.PrawcoreException) as e:
-            print('PRAW exception ' + str(e))
-            session = get_reddit("reports", True)
-
+            scan_func()
         except Exception:
             import traceback
             traceback.print_exc()
@@ -162,22 +187,30 @@ def thread_reports(new_report):
         # If a loop happens, sleep for a bit
         time.sleep(5)
 
+def get_all_reports(target):
+    """
+    Read the reported items page by page, so that reading can stop early.
+    Errors are raised, so that a partial read can be told apart from a
+    complete one.
+    """
+    session = get_reddit("reports")
+    try:
+        for item in session.subreddit(target).mod.reports(limit=None):
+            yield item
+
+    except (praw.exceptions.PRAWException, prawcore.exceptions.PrawcoreException) as e:
+        print('PRAW exception ' + str(e))
+        get_reddit("reports", True)
+        raise
 
-def thread_modlog(modlog_func):
+
+def thread_modlog(read_func):
     """
-    Watch modlog and trigger events
+    Read the new modlog entries periodically
     """
     while True:
-        session = get_reddit()
         try:
-            # Feed all modlog
-            for log in session.subreddit('mod').mod.log():
-                modlog_func(log)
-
-        except (praw.exceptions.PRAWException, prawcore.exceptions.PrawcoreException) as e:
-            print('PRAW exception ' + str(e))
-            session = get_reddit("reports", True)
-
+            read_func()
         except Exception:
             import traceback
             traceback.print_exc()
@@ -185,22 +218,33 @@ def thread_modlog(modlog_func):
         # If a loop happens, sleep for a bit
         time.sleep(30)
 
+def get_modlog(target, before=None, limit=100):
+    """
+    Read a page of the modlog, newest first. With a cursor, only the entries
+    right after it are returned.
+    """
+    params = {}
+    if before:
+        params["before"] = before
+
+    session = get_reddit("modlog")
+    try:
+        return list(session.subreddit(target).mod.log(limit=limit, params=params))
+
+    except (praw.exceptions.PRAWException, prawcore.exceptions.PrawcoreException) as e:
+        print('PRAW exception ' + str(e))
+        get_reddit("modlog", True)
+        raise
+
 
-def thread_modqueue(modlog_func, target='mod'):
+def thread_modqueue(scan_func):
     """
-    Watch modlog and trigger events
+    Scan the modqueue of all moderated subreddits periodically
     """
+    set_thread_priority(priority.MODQUEUE)
     while True:
-        session = get_reddit()
         try:
-            # Feed all modlog
-            for item in session.subreddit(target).mod.modqueue():
-                modlog_func(item)
-
-        except (praw.exceptions.PRAWException, prawcore.exceptions.PrawcoreException) as e:
-            print('PRAW exception ' + str(e))
-            session = get_reddit("reports", True)
-
+            scan_func()
         except Exception:
             import traceback
             traceback.print_exc()
@@ -208,19 +252,51 @@ def thread_modqueue(modlog_func, target='mod'):
         # If a loop happens, sleep for a bit
         time.sleep(30)
 
+def thread_moderated_subs(poll_func, interval):
+    """
+    Read the newest submissions of the moderated subreddits periodically
+    """
+    while True:
+        try:
+            poll_func()
+        except Exception:
+            import traceback
+            traceback.print_exc()
+
+        time.sleep(interval)
+
+def get_subreddit_new(multi_name, before=None):
+    """
+    Read the newest submissions of a subreddit or multireddit, newest first.
+    With a cursor, only the ones newer than it are returned.
+    """
+    params = {}
+    if before:
+        params["before"] = before
+
+    session = get_reddit("moderated_subs")
+    try:
+        return list(session.subreddit(multi_name).new(limit=100, params=params))
+
+    except (praw.exceptions.PRAWException, prawcore.exceptions.PrawcoreException) as e:
+        print('PRAW exception ' + str(e))
+        get_reddit("moderated_subs", True)
+        raise
+
 def get_all_modqueue(target):
+    """
+    Read a modqueue page by page. Errors are raised, so that a partial read
+    can be told apart from a complete one.
+    """
     session = get_reddit()
     try:
-        # Feed all modlog
         for item in session.subreddit(target).mod.modqueue(limit=None):
             yield item
 
     except (praw.exceptions.PRAWException, prawcore.exceptions.PrawcoreException) as e:
         print('PRAW exception ' + str(e))
-
-    except Exception:
-        import traceback
-        traceback.print_exc()
+        get_reddit(force_create=True)
+        raise
 
 def get_wiki(subreddit, wiki_name):
     data = subreddit.wiki[wiki_name]
@@ -0,0 +1,223 @@
+"""
+Reddit input that runs all pollers from one asyncio loop, instead of a
+thread for each poller. PRAW calls block, so each poll runs in a small
+shared thread pool and the loop only decides what to poll and when.
+
+Sessions, wiki access and other calls are the same as in modbot.input.reddit.
+"""
+import asyncio
+import concurrent.futures
+import threading
+import praw
+import prawcore
+from modbot.log import botlog, loglevel
+from modbot.utils import utcnow
+from modbot.ratelimit import priority, request_priority
+from modbot.input.reddit import Thing, set_praw_opts, get_reddit, get_reddit_object, \
+    get_rate_limit, get_all_modqueue, get_all_reports, get_subreddit_new, get_modlog, \
+    get_wiki, edit_wiki
+
+logger = botlog("redditasync", console_level=loglevel.DEBUG)
+idfeeder = botlog("idfeeder", console_level=loglevel.DEBUG)
+
+# Seconds between two polls of each endpoint
+schedules = {
+    "reports": 5,
+    "modlog": 30,
+    "modqueue": 30,
+}
+
+POLL_WORKERS = 8  # Polls that can run at the same time
+
+poll_loop = None
+poll_loop_lock = threading.Lock()
+
+
+class PollLoop():
+    """
+    Event loop that runs in a thread of its own. Blocking calls are sent to
+    a thread pool, so a slow endpoint doesn't hold back the others.
+    """
+
+    def __init__(self, workers):
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(
+            concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="poll"))
+
+        # Always a real thread, the loop runs forever
+        threading.Thread(target=self.run, name="poll_loop", daemon=True).start()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def add(self, coro):
+        """
+        Start a poller; can be called from any thread
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def call(self, func, *args):
+        return await self.loop.run_in_executor(None, func, *args)
+
+    def stop(self):
+        """
+        Cancel all pollers and stop the loop
+        """
+        async def cancel_all():
+            tasks = [task for task in asyncio.all_tasks(self.loop)
+                     if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.loop.stop()
+
+        self.add(cancel_all())
+
+
+def get_poll_loop():
+    global poll_loop
+
+    with poll_loop_lock:
+        if not poll_loop:
+            logger.debug("Starting poll loop")
+            poll_loop = PollLoop(POLL_WORKERS)
+
+    return poll_loop
+
+
+def stop_poll_loop():
+    global poll_loop
+
+    with poll_loop_lock:
+        if poll_loop:
+            poll_loop.stop()
+            poll_loop = None
+
+
+def call_with_priority(level, func, *args):
+    with request_priority(level):
+        return func(*args)
+
+
+async def every(name, interval, func, *args, level=priority.DEFAULT,
+                session=None):
+    """
+    Call a blocking function, then wait for the given number of seconds.
+    :param interval: seconds or a function that returns them
+    :param level: priority of the requests made by the function
+    :param session: reddit session used by the function, which is created
+        again after a PRAW error
+    """
+    while True:
+        try:
+            await poll_loop.call(call_with_priority, level, func, *args)
+        except (praw.exceptions.PRAWException, prawcore.exceptions.PrawcoreException) as e:
+            logger.error("[%s] PRAW exception %s" % (name, e))
+            if session:
+                get_reddit(session, True)
+        except Exception:
+            import traceback
+            traceback.print_exc()
+
+        await asyncio.sleep(interval() if callable(interval) else interval)
+
+
+def get_newest_sub():
+    for sub in get_reddit("submissions").subreddit("all").new(limit=1):
+        return sub.id
+
+
+def get_newest_comm():
+    for comm in get_reddit("comments").subreddit("all").comments(limit=1):
+        return comm.id
+
+
+async def poll_all(name, feeder, get_newest):
+    """
+    Tell the feeder about the newest item on /r/all
+    """
+    logger.debug("Getting base item for %s" % name)
+    # Get one item and set it as the initial one
+    while True:
+        try:
+            item_id = await poll_loop.call(
+                call_with_priority, priority.CATCH_UP, get_newest)
+        except Exception as e:
+            logger.error("[%s] Could not get base item: %s" % (name, e))
+            item_id = None
+
+        if item_id:
+            idfeeder.debug("Feeding %s ID %s" % (name, item_id))
+            feeder.set_initial(Thing(item_id))
+            break
+
+        await asyncio.sleep(1)
+
+    def probe():
+        item_id = get_newest()
+        if item_id:
+            idfeeder.debug("Feeding %s ID %s" % (name, item_id))
+            feeder.new_all_object(Thing(item_id))
+
+    # Wait more when there are fewer new items
+    await asyncio.sleep(feeder.probe_interval)
+    await every(name, lambda: feeder.probe_interval, probe,
+                level=priority.CATCH_UP, session=name)
+
+
+def thread_sub(feeder):
+    """
+    Watch submissions and trigger submission events
+    """
+    get_poll_loop().add(poll_all("submissions", feeder, get_newest_sub))
+
+
+def thread_comm(feeder):
+    """
+    Watch comments and trigger comments events. The feeder has a request
+    budget, so only part of the comments are fetched when there are many.
+    """
+    get_poll_loop().add(poll_all("comments", feeder, get_newest_comm))
+
+
+def thread_moderated_subs(poll_func, interval):
+    """
+    Read the newest submissions of the moderated subreddits periodically
+    """
+    get_poll_loop().add(every("moderated_subs", interval, poll_func,
+                              session="moderated_subs"))
+
+
+def thread_reports(scan_func):
+    """
+    Read the reports of all moderated subreddits periodically
+    """
+    get_poll_loop().add(every("reports", schedules["reports"], scan_func,
+                              level=priority.REPORTS, session="reports"))
+
+
+def thread_modlog(read_func):
+    """
+    Read the new modlog entries periodically
+    """
+    get_poll_loop().add(every("modlog", schedules["modlog"], read_func,
+                              session="modlog"))
+
+
+def thread_modqueue(scan_func):
+    """
+    Scan the modqueue of all moderated subreddits periodically
+    """
+    get_poll_loop().add(every("modqueue", schedules["modqueue"], scan_func,
+                              level=priority.MODQUEUE, session="default"))
+
+
+def tick(period, trigger):
+    def call_trigger():
+        trigger(utcnow())
+
+    get_poll_loop().add(every("tick", period, call_trigger))
@@ -24,8 +24,19 @@ class TestThread():
     def isAlive(self):
         return False
 
+class TestThreadPool():
+    def __init__(self, max_workers, name=None):
+        self.name = name
+
+    def submit(self, target, *args):
+        target(*args)
+
+    def shutdown(self, wait=True):
+        pass
+
 # Hook up fake thread
 utils.BotThread = TestThread
+utils.BotThreadPool = TestThreadPool
 ###############################################################################
 
 ###############################################################################
@@ -101,6 +112,16 @@ import logging
 logging.Formatter.converter = get_time
 ###############################################################################
 
+###############################################################################
+# Override API server
+###############################################################################
+import modbot.bot
+def start_server():
+    pass
+
+modbot.bot.start_server = start_server
+###############################################################################
+
 from modbot.bot import bot
 from modbot.storage import set_storage_loc, clean_storage_loc, flush_storage
 
@@ -232,6 +253,7 @@ class FakeSubreddit():
         self.subreddit_type = ["public"]
         self.sub_flairs = None
         self.modmail = []
+        self.modqueue = []
         self.sub_settings = {}
         self.stylesheet = FakeStylesheet()
         self.widgets = FakeWidgets(self)
@@ -255,6 +277,13 @@ class FakeSubreddit():
     def add_submission(self, submission):
         self.submissions.append(submission)
 
+    def add_to_modqueue(self, thing):
+        self.modqueue.append(thing)
+
+    def remove_from_modqueue(self, thing):
+        if thing in self.modqueue:
+            self.modqueue.remove(thing)
+
     def set_flairs(self, flair_list):
         self.sub_flairs = flair_list
 
@@ -313,10 +342,12 @@ class FakeSubmission():
             self._sticky = state
 
         def approve(self):
-            pass
+            self._submission.approved = True
+            self._submission.subreddit.remove_from_modqueue(self._submission)
 
         def remove(self, *args, **kwargs):
             self._submission.deleted = True
+            self._submission.subreddit.remove_from_modqueue(self._submission)
 
     crt_id = 1 # static member to keep track of the global submission ID
 
@@ -342,6 +373,8 @@ class FakeSubmission():
 
         self.is_crosspostable = True
         self.link_flair_text = None
+        self.banned_by = None
+        self.approved = False
 
         # Add submission to subreddit
         self.subreddit = get_subreddit(subreddit_name)
@@ -379,6 +412,31 @@ class FakeSubmission():
     def stickied(self):
         return self.mod._sticky
 
+    @property
+    def num_comments(self):
+        return len(self.comments)
+
+    @property
+    def fullname(self):
+        return "t3_" + self.id
+
+    @property
+    def name(self):
+        return self.fullname
+
+    @property
+    def user_reports(self):
+        counts = {}
+        for report in self.reports:
+            counts[report.reason] = counts.get(report.reason, 0) + 1
+
+        return [[reason, count, False, False] for reason, count in counts.items()]
+
+    @property
+    def mod_reports(self):
+        return [[report.reason, str(report.report_author)]
+                for report in self.reports if report.report_author]
+
     def delete_by_author(self):
         self.author = None
 
@@ -458,12 +516,18 @@ class FakePRAW():
     class FakeInbox():
         def __init__(self):
             self.messages = []
+            self.mark_read_calls = 0
 
         def unread(self, limit):
             for msg in self.messages:
                 if not msg.read:
                     yield msg
 
+        def mark_read(self, items):
+            self.mark_read_calls += 1
+            for item in items:
+                item.mark_read()
+
         def add_message(self, author, body):
             self.messages.append(FakePRAW.FakeMessage(author, body))
 
@@ -523,6 +587,10 @@ class FakeComment():
 
         new_all_com(self)
 
+    @property
+    def fullname(self):
+        return "t1_" + self.id
+
     def edit(self, body):
         self.body = body
 
@@ -538,6 +606,7 @@ def create_bot(test_subreddit):
     global com_feeder
     global time_trigger
     global moderator_for_sub
+    global modlog_entries
 
     # Cache of various objects
     cache_reddit = {}
@@ -552,6 +621,7 @@ def create_bot(test_subreddit):
     com_feeder = None
     time_trigger = None
     moderator_for_sub = {}
+    modlog_entries = []
 
     # Reset time
     set_time(0)
@@ -635,6 +705,9 @@ def get_wiki(subreddit, name):
 def edit_wiki(subreddit, wiki_name, content):
     subreddit.edit_wiki(wiki_name, content)
 
+def get_rate_limit():
+    return None
+
 def thread_sub(feeder):
     global sub_feeder
     sub_feeder = feeder
@@ -643,22 +716,83 @@ def thread_comm(feeder):
     global com_feeder
     com_feeder = feeder
 
-def thread_reports(feeder):
-    global reports_feeder
-    reports_feeder = feeder
+def thread_reports(scan_func):
+    global reports_scan
+    reports_scan = scan_func
 
-def thread_modlog(modlog_func):
-    global modlog_feeder
-    modlog_feeder = modlog_func
+def get_all_reports(target):
+    items = [item for item in cache_submissions.values()
+             if item.reports and target in ["mod", item.subreddit.name]]
 
-def feed_report(report):
-    if report.report_author:
-        reports_feeder(report, str(report.report_author), report.reason)
+    # Most recently reported first
+    items.sort(key=lambda item: (item.reports[-1].created_utc, base36.loads(item.id)),
+               reverse=True)
+    for item in items:
+        yield item
+
+def thread_modlog(read_func):
+    global modlog_read
+    modlog_read = read_func
+
+def get_modlog(target, before=None, limit=100):
+    entries = [entry for entry in modlog_entries if target in ["mod", entry.subreddit]]
+
+    if before is None:
+        entries = entries[-limit:]
+    else:
+        # Up to limit entries right after the cursor, none if it's gone
+        ids = [entry.id for entry in entries]
+        if before in ids:
+            entries = entries[ids.index(before) + 1:][:limit]
+        else:
+            entries = []
+
+    # Newest first
+    return list(reversed(entries))
+
+def thread_modqueue(scan_func):
+    global modqueue_scan
+    modqueue_scan = scan_func
+
+def thread_moderated_subs(poll_func, interval):
+    global moderated_subs_poll
+    moderated_subs_poll = poll_func
+
+def get_subreddit_new(multi_name, before=None):
+    items = []
+    for name in multi_name.split("+"):
+        items.extend(get_subreddit(name).submissions)
+    items.sort(key=lambda item: base36.loads(item.id))
+
+    if before:
+        # Up to 100 items right after the cursor
+        items = [item for item in items if base36.loads(item.id) > base36.loads(before[3:])]
+        items = items[:100]
     else:
-        reports_feeder(report, None, report.reason)
+        items = items[-100:]
+
+    # Newest first
+    return list(reversed(items))
+
+def poll_moderated_subs():
+    moderated_subs_poll()
+
+def get_all_modqueue(target):
+    for sub in list(cache_subreddit.values()):
+        if target in ["mod", sub.name]:
+            # Newest items first
+            for item in reversed(sub.modqueue):
+                yield item
+
+def scan_modqueue():
+    modqueue_scan()
+
+def feed_report(report):
+    reports_scan()
 
 def feed_modlog(modlog):
-    modlog_feeder(modlog)
+    modlog_entries.append(modlog)
+    modlog_read()
 
 def set_initial_sub(sub):
     sub_feeder.set_initial(sub)
@@ -5,7 +5,8 @@ from modbot.log import botlog
 from modbot.wiki_page import WatchedWiki
 from modbot.hook import callback_type
 from modbot.storage import get_stored_dict
-from modbot.utils import BotThread, cron_next
+from modbot.utils import cron_next
+from modbot import executor
 logger = botlog("mod_sub")
 exception = botlog("exception")
 
@@ -130,11 +131,13 @@ class DispatchAll():
             for cbk in self.callbacks_mlog:
                 self.to_call(cbk, False, {**self.extra_args, **extra_args})
 
-        def run_modqueue(self, modlog, extra_args):
+        def run_modqueue(self, modqueue, extra_args, changed=True):
             """
             Run all modqueue items
             """
             for cbk in self.callbacks_mqueue:
+                if cbk.changed_only and not changed:
+                    continue
                 self.to_call(cbk, False, {**self.extra_args, **extra_args})
 
     def __repr__(self):
@@ -187,10 +190,11 @@ class DispatchAll():
                 exception.exception(
                     "Exception: " + traceback.format_exc())
         if with_thread:
-            BotThread(
-                name="periodic_" + str(el.func),
-                target=trigger_func,
-                args=(el, {**self.plugin_args, **extra_args},))
+            # Called from the tick thread, which must not wait. A run is
+            # skipped while the previous one of the same hook is not done.
+            executor.submit(el.plugin_name, trigger_func,
+                            el, {**self.plugin_args, **extra_args},
+                            block=False, key=(id(self), el.func))
         else:
             trigger_func(el, {**self.plugin_args, **extra_args})
 
@@ -201,6 +205,22 @@ class DispatchAll():
         if alias not in self.plugin_args:
             self.plugin_args[alias] = object
 
+    def has_hooks(self, ctype):
+        """
+        Check if there are active submission or comment hooks
+        """
+        if ctype == callback_type.SUB:
+            attr = "callbacks_subs"
+        else:
+            attr = "callbacks_coms"
+
+        for container in [self.generic_hooks, self.enabled_wiki_hooks]:
+            for cbk in getattr(container, attr):
+                if not cbk.active or cbk.active():
+                    return True
+
+        return False
+
     def add_callback(self, func_list):
         # Check each callback type
         for cbk in func_list:
@@ -284,13 +304,13 @@ class DispatchAll():
         self.generic_hooks.run_modlog(modlog, extra)
         self.enabled_wiki_hooks.run_modlog(modlog, extra)
 
-    def run_modqueue(self, modqueue):
+    def run_modqueue(self, modqueue, changed=True):
         extra = {
             "modqueue": modqueue,
             "subreddit_name": modqueue.subreddit_name}
 
-        self.generic_hooks.run_modqueue(modqueue, extra)
-        self.enabled_wiki_hooks.run_modqueue(modqueue, extra)
+        self.generic_hooks.run_modqueue(modqueue, extra, changed)
+        self.enabled_wiki_hooks.run_modqueue(modqueue, extra, changed)
 
 
 class DispatchSubreddit(DispatchAll):
@@ -15,7 +15,7 @@ from modbot.hook import callback_type
 from modbot import utils
 from modbot.log import botlog
 from modbot.moderated_sub import DispatchAll, DispatchSubreddit
-from modbot.reddit_wrapper import get_moderated_subs, get_subreddit, start_tick, get_submission, watch_all, get_user
+from modbot.reddit_wrapper import get_moderated_subs, get_subreddit, start_tick, get_submission, get_items, watch_all, get_user
 
 logger = botlog("plugin")
 
@@ -96,13 +96,16 @@ class plugin_manager():
         print("[%d] Startup done!" % utils.utcnow())
 
         # Start watching subreddits
+        self.compile_interest()
         watch_all(
             self.feed_sub,
             self.feed_comms,
             self.feed_inbox,
             self.feed_reports,
             self.feed_modlog,
-            self.feed_modqueue)
+            self.feed_modqueue,
+            sub_filter=lambda raw: self.wants_item(callback_type.SUB, raw),
+            comm_filter=lambda raw: self.wants_item(callback_type.COM, raw))
 
     def get_subreddit(self, name):
         return get_subreddit(name)
@@ -110,8 +113,11 @@ class plugin_manager():
     def get_moderated_subs(self):
         return get_moderated_subs()
 
-    def get_submission(self, url):
-        return get_submission(url)
+    def get_submission(self, url, fresh=False):
+        return get_submission(url, fresh)
+
+    def get_items(self, item_ids, fresh=False):
+        return get_items(item_ids, fresh)
 
     def add_reddit_function(self, func):
         # Check if we should add it to the generic dispatcher or a specific one
@@ -213,6 +219,9 @@ class plugin_manager():
         for dispatch in self.dispatchers.values():
             dispatch.run_periodic(self.start_time, tnow)
 
+        # Hooks could have been enabled or disabled
+        self.compile_interest()
+
         # Account for threads
         for thr in self.plugin_threads.copy():
             if thr.is_alive():
@@ -220,6 +229,40 @@ class plugin_manager():
             else:
                 self.plugin_threads.remove(thr)
 
+    def compile_interest(self):
+        """
+        Find the subreddits that have active submission and comment hooks
+        and whether there are generic hooks that want all items
+        """
+        interest = {}
+        for ctype in [callback_type.SUB, callback_type.COM]:
+            generic = self.dispatchers[DISPATCH_ANY].has_hooks(ctype)
+            subs = frozenset(
+                str(name).lower() for name, disp in self.dispatchers.items()
+                if name != DISPATCH_ANY and disp.has_hooks(ctype))
+
+            interest[ctype] = (generic, subs)
+
+        self.interest = interest
+
+    def wants_item(self, ctype, raw):
+        """
+        Check if any hook would use an item from /r/all. Only fields that
+        come with the item are used, so that nothing is fetched.
+        """
+        # Deleted items are skipped anyway
+        if getattr(raw, "author", True) is None:
+            return False
+
+        generic, subs = self.interest[ctype]
+        if generic:
+            return True
+
+        try:
+            return raw.subreddit.display_name.lower() in subs
+        except AttributeError:
+            return True
+
     def feed_sub(self, submission):
         """
         Feeds a new submission to the plugin framework. This function calls
@@ -270,19 +313,20 @@ class plugin_manager():
         if disp:
             disp.run_modlog(modlog)
 
-    def feed_modqueue(self, modqueue):
+    def feed_modqueue(self, modqueue, changed=True):
         """
         Feeds a new modqueue to the plugin framework. This function calls
         plugins that match the comment.
 
         :param modqueue: modqueue object
+        :param changed: whether the item is new or changed since the last pass
         """
 
-        self.dispatchers[DISPATCH_ANY].run_modqueue(modqueue)
+        self.dispatchers[DISPATCH_ANY].run_modqueue(modqueue, changed)
 
         disp = self.dispatchers.get(modqueue.subreddit_name, None)
         if disp:
-            disp.run_modqueue(modqueue)
+            disp.run_modqueue(modqueue, changed)
 
 
     def feed_inbox(self, message):
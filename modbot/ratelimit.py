@@ -0,0 +1,155 @@
+import enum
+import time
+import threading
+import contextlib
+from modbot.log import botlog
+
+logger = botlog("ratelimit")
+
+
+class priority(enum.IntEnum):
+    """
+    Request priorities, the most important first
+    """
+    COMMAND = 0  # messages sent to the bot
+    MODQUEUE = 1
+    REPORTS = 2
+    DEFAULT = 3  # periodic hooks, modlog, wiki pages
+    CATCH_UP = 4  # fetching new /r/all items
+
+
+# Fraction of the rate limit that is kept for more important requests.
+# A request waits until the limit resets if less than its reserve is left.
+reserves = {
+    priority.COMMAND: 0,
+    priority.MODQUEUE: 0.05,
+    priority.REPORTS: 0.1,
+    priority.DEFAULT: 0.15,
+    priority.CATCH_UP: 0.3,
+}
+
+thread_data = threading.local()
+
+
+def current_priority():
+    return getattr(thread_data, "priority", priority.DEFAULT)
+
+
+def set_thread_priority(level):
+    """
+    Set the priority of all requests made by the current thread
+    """
+    thread_data.priority = level
+
+
+@contextlib.contextmanager
+def request_priority(level):
+    """
+    Set the priority of the requests made inside the block
+    """
+    old = current_priority()
+    thread_data.priority = level
+    try:
+        yield
+    finally:
+        thread_data.priority = old
+
+
+class RequestScheduler():
+    """
+    Shared budget of all API requests. The remaining quota is taken from the
+    response headers. Requests are let through by priority: when the quota
+    runs low, less important requests wait for the next reset and no
+    request waits behind a less important one.
+    """
+
+    def __init__(self, get_time=time.monotonic):
+        self.get_time = get_time
+        self.cond = threading.Condition()
+
+        self.remaining = None
+        self.used = None
+        self.reset_at = None
+
+        # Number of waiting requests for each priority
+        self.waiting = {level: 0 for level in priority}
+
+    def update(self, remaining, used, reset_seconds):
+        """
+        Set the quota reported by the server
+        """
+        with self.cond:
+            self.remaining = remaining
+            self.used = used
+            self.reset_at = self.get_time() + reset_seconds
+            self.cond.notify_all()
+
+    def update_from_headers(self, headers):
+        try:
+            self.update(
+                float(headers["x-ratelimit-remaining"]),
+                float(headers["x-ratelimit-used"]),
+                float(headers["x-ratelimit-reset"]))
+        except (KeyError, ValueError):
+            pass
+
+    def headroom(self):
+        """
+        Return the fraction of the quota that is left or None if not known
+        """
+        with self.cond:
+            if self.remaining is None or self.get_time() >= self.reset_at:
+                return None
+
+            total = self.remaining + self.used
+            if total <= 0:
+                return None
+
+            return self.remaining / total
+
+    def should_shed(self, level=None):
+        """
+        Tell if optional work of the given priority should be skipped
+        """
+        if level is None:
+            level = current_priority()
+
+        headroom = self.headroom()
+        return headroom is not None and headroom <= reserves[level]
+
+    def allowed(self, level):
+        if any(self.waiting[other] for other in priority if other < level):
+            return False
+
+        return not self.should_shed(level)
+
+    def acquire(self, level=None):
+        """
+        Wait until a request of the given priority can be made
+        """
+        if level is None:
+            level = current_priority()
+
+        with self.cond:
+            if not self.allowed(level):
+                logger.debug("Deferring %s request, %s of the quota left" %
+                             (level.name, self.headroom()))
+
+            self.waiting[level] += 1
+            try:
+                while not self.allowed(level):
+                    timeout = 1
+                    if self.reset_at is not None:
+                        timeout = min(max(self.reset_at - self.get_time(), 0.01), 1)
+                    self.cond.wait(timeout)
+            finally:
+                self.waiting[level] -= 1
+                self.cond.notify_all()
+
+            # Count the request until the next response updates the quota
+            if self.remaining is not None and self.remaining > 0:
+                self.remaining -= 1
+                self.used += 1
+
+
+scheduler = RequestScheduler()
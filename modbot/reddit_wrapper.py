@@ -1,16 +1,21 @@
 import base36
+import time
+import queue
+import threading
+import contextlib
 import importlib
+import collections
 from modbot.log import botlog, loglevel
-from modbot.utils import utcnow, timedata, BotThread, get_utcnow, timestamp_to_datetime
-from modbot.storage import dsdict, get_stored_dict
+from modbot.utils import utcnow, timedata, BotThread, BotThreadPool, get_utcnow, timestamp_to_datetime
+from modbot.storage import get_stored_dict
+from modbot.ratelimit import scheduler, priority, request_priority
 
 logger = botlog("reddit_wrapper", console_level=loglevel.DEBUG)
 audit = botlog("audit", console_level=loglevel.DEBUG)
 watch_dict = {}  # maps watched subreddits to threads
 
-posted_things_body = get_stored_dict("all", "posted")
-
 backend = None
+posted_things_body = None
 all_data = None
 subreddit_cache = None
 wiki_storages = None
@@ -18,10 +23,16 @@ sub_feeder = None
 com_feeder = None
 bot_signature = None
 inbox_thread = None
+inbox_pool = None
+inbox_feeder = None
 last_inbox_update = None
 report_cmds = None
 cache_data = None
-modlog_hist = None
+modlog_reader = None
+thing_cache = None
+modqueue_tracker = None
+report_tracker = None
+subreddit_poller = None
 
 last_moderator_subs_check = 0
 moderator_subs_list = []
@@ -31,33 +42,161 @@ SUBMISSION_PREFIX = "t3_"
 SUBMISSION_PREFIX = "t3_"
 
 COLD_WIKI_LIMIT = timedata.SEC_IN_MIN * 5
+FETCH_RETRY_DELAY = 5  # Seconds to wait before retrying a failed fetch
+FETCH_MAX_RETRIES = 5  # Failed fetches after which a range is left to the gap index
+FEEDER_CHECKPOINT_INTERVAL = 30  # Seconds between saving the progress of a range
+FEEDER_MAX_RESUME = 50000  # Skip the backlog if more items were missed while stopped
+INFO_MAX_IDS = 100  # Maximum number of IDs that can be requested at once
+GAP_RETRY_DELAY = timedata.SEC_IN_MIN * 2  # Wait before retrying IDs that returned nothing
+GAP_MIN_RETRY_HITS = 0.01  # Retry hit rate below which empty spans are mostly dropped
+GAP_RETRY_SAMPLE = 10  # When dropping, still retry one in this many batches
+MODQUEUE_FULL_SCAN_INTERVAL = timedata.SEC_IN_MIN * 30  # Read the whole modqueue this often
+MODQUEUE_KNOWN_STOP = 100  # Stop reading the modqueue after this many unchanged items in a row
+REPORTS_FULL_SCAN_INTERVAL = timedata.SEC_IN_MIN * 30  # Read all reported items this often
+REPORTS_KNOWN_STOP = 25  # Stop reading reports after this many unchanged items in a row
+INBOX_MARK_READ_BATCH = 25  # Messages marked as read in one request
+INBOX_WORKERS = 4  # Inbox commands that can run at the same time
+MULTIREDDIT_MAX_LEN = 1000  # Characters of subreddit names joined in one r/sub1+sub2 request
+SUBREDDIT_CURSOR_CHECK = 10  # Empty polls after which a subreddit cursor is checked
+RECENT_FED_SIZE = 10000  # Fullnames remembered to not feed an item twice
+MODLOG_PAGE_SIZE = 100  # Modlog entries per request
+MODLOG_MAX_PAGES = 10  # Pages of new modlog entries read at once
+MODLOG_CURSOR_CHECK = 20  # Empty modlog reads after which the cursor is checked
+MODLOG_RECENT_SIZE = 1000  # Modlog IDs remembered to not feed an entry twice
+
+# Limits within which the feeders adapt to the amount of new items
+feeder_opts = {
+    "min_workers": 1,
+    "max_workers": 10,
+    "max_batch": INFO_MAX_IDS,
+    "min_probe_interval": 5,
+    "max_probe_interval": 60,
+    # Fraction of the rate limit below which the feeders slow down
+    "min_headroom": 0.2,
+    # Requests per minute for /r/all comments, which are too many to fetch all
+    "comment_requests_per_min": 30,
+    # Seconds between reads of the newest submissions of moderated subreddits
+    "moderated_subs_interval": 10,
+}
+# Size and lifetime in seconds of the cached items, by kind
+cache_opts = {
+    "size": 10000,
+    "submission_ttl": 60,
+    "comment_ttl": 60,
+    "user_ttl": timedata.SEC_IN_MIN * 30,
+}
+USER_KEY_PREFIX = "user:"
 update_intervals = {
     "inbox_update": 10,
     "moderated_subs": timedata.SEC_IN_MIN * 30,
-    "moderator_users": timedata.SEC_IN_MIN * 30
+    "moderator_users": timedata.SEC_IN_MIN * 30,
+    "report_cmds": timedata.SEC_IN_MIN * 60,
 }
 
 
+class ThingSnapshot():
+    """
+    Immutable copy of the fields of a reddit item. It's taken once, so
+    reading the fields never goes back to reddit.
+    """
+    __slots__ = ()
+    FIELDS = ()
+
+    def __init__(self, raw):
+        # The first field read fetches a lazy item. Errors from the fetch
+        # propagate, so a failed fetch never becomes an empty snapshot.
+        # Only fields that are missing after the fetch default to None.
+        for field in self.FIELDS:
+            object.__setattr__(self, field, getattr(raw, field, None))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Snapshots can't be changed, use refresh()")
+
+    def __delattr__(self, name):
+        raise AttributeError("Snapshots can't be changed, use refresh()")
+
+
+class SubmissionSnapshot(ThingSnapshot):
+    FIELDS = ("id", "name", "subreddit", "author", "created_utc", "permalink",
+              "user_reports", "shortlink", "title", "is_crosspostable",
+              "is_self", "url", "link_flair_text", "domain", "selftext",
+              "stickied", "num_comments")
+    __slots__ = FIELDS
+
+
+class CommentSnapshot(ThingSnapshot):
+    FIELDS = ("id", "name", "subreddit", "author", "created_utc", "permalink",
+              "user_reports", "body")
+    __slots__ = FIELDS
+
+
 class BaseThing():
+    """
+    Wraps a PRAW item. Fields are read from a snapshot that is taken the
+    first time a field is accessed; call refresh() to get current values.
+    """
+    snapshot_class = None
+    prefix = None
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._snapshot = None
+
+    @property
+    def snapshot(self):
+        if self._snapshot is None:
+            self._snapshot = self.snapshot_class(self._raw)
+
+        return self._snapshot
+
+    @property
+    def fullname(self):
+        return self.snapshot.name or (self.prefix + self.snapshot.id)
+
+    def refresh(self):
+        """
+        Get the current state of the item from reddit
+        """
+        for item in backend.get_reddit().info([self.fullname]):
+            self._raw = item
+            self._snapshot = None
+            thing_cache.put(self.fullname, self)
+
+        return self
+
+    def invalidate(self):
+        """
+        Drop the cached copy of the item, after the bot changed it
+        """
+        thing_cache.invalidate(self._raw.fullname)
+
+    def moderated(self):
+        """
+        Forget the item after the bot approved or removed it, as it left
+        the modqueue
+        """
+        self.invalidate()
+        modqueue_tracker.discard(self._raw.fullname)
+
     @property
     def subreddit_name(self):
-        return self._raw.subreddit.display_name
+        return self.snapshot.subreddit.display_name
 
     @property
     def subreddit(self):
         try:
-            return get_subreddit(self._raw.subreddit.display_name)
+            return get_subreddit(self.snapshot.subreddit.display_name)
         except:
             logger.debug("Could not get subreddit %s" %
-                         self._raw.subreddit.display_name)
+                         self.snapshot.subreddit)
 
     @property
     def id(self):
-        return self._raw.id
+        return self.snapshot.id
 
     @property
     def user_reports(self):
-        reports = self._raw.user_reports
+        reports = self.snapshot.user_reports or []
 
         to_return = []
         for description, count, _, _ in reports:
@@ -69,13 +208,13 @@ class BaseThing():
 
     @property
     def created_utc(self):
-        return self._raw.created_utc
+        return self.snapshot.created_utc
 
     @property
     def author(self):
         try:
-            if self._raw.author:
-                return user(self._raw.author)
+            if self.snapshot.author:
+                return user(self.snapshot.author)
             else:
                 return None
         except:
@@ -83,58 +222,59 @@ class BaseThing():
 
     @property
     def created_utc_as_datetime(self):
-        return timestamp_to_datetime(self._raw.created_utc)
+        return timestamp_to_datetime(self.snapshot.created_utc)
 
     @property
     def permalink(self):
-        return f"https://reddit.com{self._raw.permalink}"
+        return f"https://reddit.com{self.snapshot.permalink}"
 
 class submission(BaseThing):
     """
     Class that encapsulates a PRAW submission
     """
-
-    def __init__(self, reddit_sub):
-        self._raw = reddit_sub
+    snapshot_class = SubmissionSnapshot
+    prefix = SUBMISSION_PREFIX
 
     def __repr__(self):
-        return self._raw.shortlink
+        return self.snapshot.shortlink
 
     def set_flair_id(self, flair_id):
         logger.debug("[%s] Set flair id: %s" % (self, flair_id))
         self._raw.flair.select(flair_id)
+        self.invalidate()
 
     @property
     def shortlink(self):
-        return self._raw.shortlink
+        return self.snapshot.shortlink
 
     @property
     def title(self):
-        return self._raw.title
+        return self.snapshot.title
 
     @property
     def is_crosspostable(self):
-        return self._raw.is_crosspostable
+        return self.snapshot.is_crosspostable
 
     @property
     def is_self(self):
-        return self._raw.is_self
+        return self.snapshot.is_self
 
     @property
     def url(self):
-        return self._raw.url
+        return self.snapshot.url
 
     @property
     def link_flair_text(self):
-        return self._raw.link_flair_text
+        return self.snapshot.link_flair_text
 
     @property
     def domain(self):
-        return self._raw.domain
+        return self.snapshot.domain
 
     def report(self, reason):
         audit.debug("[%s] Reported with reason: %s" % (self, reason))
         self._raw.report(reason)
+        self.invalidate()
 
     @property
     def flair(self):
@@ -142,7 +282,7 @@ class submission(BaseThing):
 
     @property
     def selftext(self):
-        return self._raw.selftext
+        return self.snapshot.selftext
 
     def edit(self, body):
         if self.shortlink in posted_things_body and \
@@ -151,17 +291,19 @@ class submission(BaseThing):
 
         posted_things_body[self.shortlink] = body
         self._raw.edit(body)
+        self.invalidate()
 
     @property
     def stickied(self):
-        return self._raw.stickied
+        return self.snapshot.stickied
 
     @property
     def num_comments(self):
-        return len(self._raw.comments)
+        return self.snapshot.num_comments
 
     def make_sticky(self):
         self._raw.mod.sticky(state=True, bottom=True)
+        self.invalidate()
 
     def delete(self, spam=False, reason_id=None):
         """
@@ -169,6 +311,7 @@ class submission(BaseThing):
         """
         audit.debug("[comment] Removed %s" % (self.permalink))
         self._raw.mod.remove(spam=spam, reason_id=reason_id)
+        self.moderated()
 
     def approve(self):
         """
@@ -176,19 +319,19 @@ class submission(BaseThing):
         """
         audit.debug("[comment] Approved %s" % (self.permalink))
         self._raw.mod.approve()
+        self.moderated()
 
 
 class comment(BaseThing):
     """
     Class that encapsulates a PRAW comment
     """
-
-    def __init__(self, reddit_comm):
-        self._raw = reddit_comm
+    snapshot_class = CommentSnapshot
+    prefix = COMMENT_PREFIX
 
     @property
     def body(self):
-        return self._raw.body
+        return self.snapshot.body
 
     def delete(self):
         """
@@ -196,6 +339,7 @@ class comment(BaseThing):
         """
         audit.debug("[comment] Removed %s" % (self.permalink))
         self._raw.mod.remove()
+        self.moderated()
 
     def approve(self):
         """
@@ -203,6 +347,7 @@ class comment(BaseThing):
         """
         audit.debug("[comment] Approved %s" % (self.permalink))
         self._raw.mod.approve()
+        self.moderated()
 
 
 class wiki():
@@ -235,8 +380,8 @@ class wiki():
         if self.subreddit_name not in wiki_storages:
             logger.debug("Adding %s/%s to wiki storage" %
                          (self.subreddit_name, self.name))
-            wiki_storages[self.subreddit_name] = dsdict(
-                self.subreddit_name, "wiki_cache")
+            wiki_storages[self.subreddit_name] = get_stored_dict(
+                self.subreddit_name, "wiki_cache", lazy=True)
 
         storage = wiki_storages[self.subreddit_name]
         storage[self.name] = {
@@ -247,8 +392,6 @@ class wiki():
             "author": str(self.author),
             "revision_date": self.revision_date}
 
-        storage.sync()
-
     def edit(self, content):
         backend.edit_wiki(get_subreddit(
             self.subreddit_name)._raw, self.name, content)
@@ -310,7 +453,8 @@ class subreddit():
         logger.debug("[%s] Access wiki: %s" % (self, name))
 
         if str(self) not in wiki_storages:
-            wiki_storages[str(self)] = dsdict(str(self), "wiki_cache")
+            wiki_storages[str(self)] = get_stored_dict(
+                str(self), "wiki_cache", lazy=True)
 
         # Check if there is a copy of the wiki stored
         if name in wiki_storages[str(self)] and \
@@ -423,116 +567,459 @@ class report():
     def subreddit_name(self):
         return self._raw.subreddit.display_name
 
+class SessionPool():
+    """
+    Hands out named PRAW sessions, so that concurrent fetches don't share
+    the same session
+    """
+
+    def __init__(self, prefix, size):
+        self.names = queue.Queue()
+        for idx in range(size):
+            self.names.put("%s_%d" % (prefix, idx))
+
+    @contextlib.contextmanager
+    def session(self):
+        name = self.names.get()
+        try:
+            yield name
+        finally:
+            self.names.put(name)
+
+
 class BotFeeder():
     """
-    Feeds submissions or comments to a given function
+    Feeds submissions or comments to a given function.
+
+    The ID range between the last fed and the last seen object is split in
+    ranges of up to max_batch IDs that are fetched by a pool of threads,
+    each using its own PRAW session. Ranges are kept in the order they were
+    created and the fed position only advances over ranges that are
+    finished.
+
+    The number of ranges fetched at once follows the drift and the remaining
+    rate limit, and probe_interval tells how often /r/all should be checked
+    for the newest item.
+
+    With a request budget, at most that many requests are made each minute.
+    If the backlog grows beyond what one minute of budget can fetch, the
+    oldest IDs are skipped; stats() tells how much of the stream was
+    covered.
+
+    Items that are in recent were already fed by another source, such as
+    the subreddit poller, and are skipped.
+
+    Progress is saved when a range is finished and every
+    FEEDER_CHECKPOINT_INTERVAL seconds while a range is being fetched. After
+    a restart, unfinished ranges continue from their last saved item.
+
+    IDs that return nothing (other kinds, deleted, private or not visible
+    yet) don't hold back the fed position. They are kept as spans in the
+    gap index and retried once, GAP_RETRY_DELAY seconds later, packed in
+    full batches. If retries stop finding anything, most of them are
+    dropped without being fetched.
     """
 
-    def __init__(self, storage, objtype, callback, objclass, max_workers, items_per_worker):
+    def __init__(self, storage, objtype, callback, objclass, max_workers, max_batch,
+                 min_workers=1, min_probe_interval=5, max_probe_interval=60, min_headroom=0.2,
+                 item_filter=None, request_budget=0, recent=None):
         self.objtype = objtype
         self.storage = storage
 
-        storage[self.objtype] = {}
+        # Keep the state of the previous run, so that it can be resumed
+        self.resume_workers = []
+        self.initialized = True
+        old_state = storage.get(self.objtype)
+        if old_state and old_state.get("fed"):
+            # Wait for the current position on /r/all before fetching
+            self.initialized = False
+            self.resume_workers = [worker for worker in old_state["workers"]
+                                   if not worker["finished"]]
+        else:
+            # Initialize empty members
+            storage[self.objtype] = {
+                "pending": 0,
+                "seen": 0,
+                "fed": 0,
+                "workers": []}
         self.storchild = storage[objtype]
+        if "gaps" not in self.storchild:
+            with storage.batch():
+                # Empty ID spans as [start, end, retry time]
+                self.storchild["gaps"] = []
+                self.storchild["hit_rate"] = None
+                self.storchild["retry_hit_rate"] = None
+        self.gap_lock = threading.RLock()
+        self.gap_batches = 0
+
         self.callback = callback
         self.objclass = objclass
 
+        # Tells from the raw item if anyone wants it, before it's wrapped
+        self.item_filter = item_filter
+        self.filtered = 0
+
+        # Items that were already fed by another source
+        self.recent = recent
+        self.duplicates = 0
+
         self.max_workers = max_workers
-        self.items_per_worker = items_per_worker
+        self.min_workers = min(min_workers, max_workers)
+        self.max_batch = min(max_batch, INFO_MAX_IDS)
+        self.min_probe_interval = min_probe_interval
+        self.max_probe_interval = max_probe_interval
+        self.min_headroom = min_headroom
         self.worker_processing = False
 
-        # Initialize empty members
-        self.storchild["pending"] = 0
-        self.storchild["seen"] = 0
-        self.storchild["fed"] = 0
-        self.storchild["workers"] = []
-        self.storage.sync()
+        # Number of ranges that can be fetched at once, adapted to the drift
+        self.workers_limit = max_workers
+
+        # Estimated number of new items per second and when it was measured
+        self.item_rate = None
+        self.last_probe = None
+
+        # Requests per minute, 0 for no limit, and when the last ones were made
+        self.request_budget = request_budget
+        self.request_times = collections.deque()
 
-    def set_all_object(self, name, obj, dosync=True):
+        # Number of IDs that were fetched or skipped because of the budget
+        self.requested_ids = 0
+        self.skipped_ids = 0
+
+        self.pool = BotThreadPool(max_workers, "ketchup_%s" % objtype)
+        self.sessions = SessionPool("feeder_%s" % objtype, max_workers)
+
+    def set_all_object(self, name, obj):
         """
         Set a generic object in storage
         """
-        if self.objtype not in self.storage:
-            self.storage[self.objtype] = {}
-
         self.storchild[name] = base36.loads(obj.id)
 
-        # Check if we should sync the data
-        if dosync:
-            self.storage.sync()
-
     def set_initial(self, obj):
         """
         Initialize storage
         """
-        self.set_all_object("init", obj, False)
-        self.set_all_object("fed", obj, False)
-        self.set_all_object("pending", obj)
+        # Continue from where the last run stopped, unless it's too far behind
+        if self.storchild["fed"] and \
+                base36.loads(obj.id) - self.storchild["fed"] <= FEEDER_MAX_RESUME:
+            logger.info("Resuming %s from %d" %
+                        (self.objtype, self.storchild["fed"]))
+            self.new_all_object(obj)
+            self.initialized = True
+            return
+
+        self.resume_workers = []
+        with self.storage.batch():
+            self.storchild["workers"] = []
+            self.set_all_object("init", obj)
+            self.set_all_object("fed", obj)
+            self.set_all_object("pending", obj)
+        self.initialized = True
 
     def new_all_object(self, obj):
         """
         Mark that a new object has been seen on /r/all
         """
-        self.set_all_object("seen", obj)
-        self.storchild["drift"] = self.storchild["seen"] - \
-            self.storchild["fed"]
+        tnow = time.monotonic()
+        last_seen = self.storchild["seen"]
+
+        with self.storage.batch():
+            self.set_all_object("seen", obj)
+            self.storchild["drift"] = self.storchild["seen"] - \
+                self.storchild["fed"]
+
+        # Smooth out the rate at which new items show up
+        if self.last_probe and last_seen and tnow > self.last_probe:
+            rate = max(self.storchild["seen"] - last_seen, 0) / \
+                (tnow - self.last_probe)
+            if self.item_rate is None:
+                self.item_rate = rate
+            else:
+                self.item_rate = 0.7 * self.item_rate + 0.3 * rate
+        self.last_probe = tnow
+
+    def low_headroom(self):
+        """
+        Check if the remaining rate limit is low
+        """
+        headroom = backend.get_rate_limit()
+        return headroom is not None and headroom < self.min_headroom
+
+    @property
+    def probe_interval(self):
+        """
+        Seconds to wait before looking for the newest item again, so that
+        each probe brings about a full batch of new items
+        """
+        if not self.item_rate or self.low_headroom():
+            return self.max_probe_interval
+
+        return min(max(self.max_batch / self.item_rate,
+                       self.min_probe_interval), self.max_probe_interval)
+
+    def adapt(self):
+        """
+        Set how many ranges are fetched at once: enough to cover the drift,
+        but only the minimum when the rate limit is running out
+        """
+        if self.low_headroom():
+            self.workers_limit = self.min_workers
+            return
+
+        drift = self.storchild["seen"] - self.storchild["fed"]
+        needed = -(-drift // self.max_batch)
+        self.workers_limit = min(max(needed, self.min_workers), self.max_workers)
+
+    def budget_left(self):
+        """
+        Number of requests that can still be made in the current minute
+        """
+        if not self.request_budget:
+            return None
+
+        tnow = utcnow()
+        while self.request_times and tnow - self.request_times[0] >= timedata.SEC_IN_MIN:
+            self.request_times.popleft()
+
+        return self.request_budget - len(self.request_times)
+
+    def spend_request(self, nb_ids):
+        self.requested_ids += nb_ids
+        if self.request_budget:
+            self.request_times.append(utcnow())
+
+    def skip_backlog(self):
+        """
+        Skip the oldest IDs that can't be fetched within one minute of budget
+        """
+        if not self.request_budget:
+            return
+
+        allowed = self.request_budget * self.max_batch
+        backlog = self.storchild["seen"] - self.storchild["pending"]
+        if backlog <= allowed:
+            return
+
+        skipped = {}
+        skipped["start"] = self.storchild["pending"] + 1
+        skipped["end"] = self.storchild["seen"] - allowed
+        skipped["finished"] = 1
+
+        # A finished range, so that the fed position moves over it in order
+        with self.storage.batch():
+            self.storchild["workers"].append(skipped)
+            self.storchild["pending"] = skipped["end"]
+        self.skipped_ids += skipped["end"] - skipped["start"] + 1
+
+        logger.debug("Skipped %d %s IDs over budget" %
+                     (skipped["end"] - skipped["start"] + 1, self.objtype))
+
+    def stats(self):
+        """
+        Return how much of the stream was fetched
+        """
+        coverage = None
+        if self.requested_ids + self.skipped_ids:
+            coverage = self.requested_ids / (self.requested_ids + self.skipped_ids)
+
+        return {
+            "requested": self.requested_ids,
+            "skipped": self.skipped_ids,
+            "filtered": self.filtered,
+            "duplicates": self.duplicates,
+            "coverage": coverage,
+            "drift": self.storchild["seen"] - self.storchild["fed"]}
 
     def create_new_worker(self):
         """
-        Create a new worker to feed items to the bot
+        Queue ranges to be fetched until all seen items are pending or all
+        workers are busy
         """
+        self.skip_backlog()
 
         # If there is a difference in seen vs. pending items
-        if self.storchild["seen"] - self.storchild["pending"] <= 0:
-            return
+        while self.storchild["seen"] - self.storchild["pending"] > 0 and \
+                len(self.storchild["workers"]) < self.workers_limit:
+            if self.budget_left() == 0:
+                break
+
+            # Wait for a full batch, unless there is nothing else to fetch
+            if self.storchild["seen"] - self.storchild["pending"] < self.max_batch and \
+                    len(self.storchild["workers"]) > 0:
+                break
 
-        if len(self.storchild["workers"]) < self.max_workers:
             new_obj = {}
             new_obj["start"] = self.storchild["pending"] + 1
             new_obj["end"] = min(self.storchild["seen"],
-                                 new_obj["start"] + self.items_per_worker)
+                                 new_obj["start"] + self.max_batch - 1)
             new_obj["finished"] = 0
 
-            self.storchild["workers"].append(new_obj)
-            self.storchild["pending"] = new_obj["end"]
+            with self.storage.batch():
+                self.storchild["workers"].append(new_obj)
+                self.storchild["pending"] = new_obj["end"]
             #print("Start: %d -> %d" % (new_obj["start"], new_obj["end"]))
             #print("Pending %d, Fed %d\n" % (self.storchild["pending"], self.storchild["fed"]))
-            self.storage.sync()
 
-            BotThread(
-                name="ketchup_thread",
-                target=self.catch_up,
-                args=(new_obj,))
+            # Use the stored copy, so that the worker state is tracked
+            new_obj = self.storchild["workers"][-1]
 
-    def clean_up_finished(self):
+            self.spend_request(new_obj["end"] - new_obj["start"] + 1)
+            self.pool.submit(self.catch_up, new_obj)
+
+        self.retry_gaps()
+
+    def update_hit_rate(self, name, hits, requested):
         """
-        Clean up finished workers
+        Update the smoothed fraction of requested IDs that returned an item
         """
-        changed = False
-        # The first element should always be the one that should be consumed
-        while len(self.storchild["workers"]) > 0 and self.storchild["workers"][0]["finished"] == 1:
-            changed = True
-            element = self.storchild["workers"][0]
+        if not requested:
+            return
 
-            self.storchild["fed"] = element["end"]
-            self.storchild["drift"] = self.storchild["seen"] - \
-                self.storchild["fed"]
-            self.storchild["workers"] = self.storchild["workers"][1:]
-            #print("Ended: %d -> %d" % (element["start"], element["end"]))
-            #print("Pending %d, Fed %d\n" % (self.storchild["pending"], self.storchild["fed"]))
+        rate = hits / requested
+        if self.storchild[name] is not None:
+            rate = 0.9 * self.storchild[name] + 0.1 * rate
+        self.storchild[name] = rate
+
+    def add_gaps(self, numbers):
+        """
+        Add IDs that returned nothing to the gap index
+        """
+        spans = []
+        for num in sorted(numbers):
+            if spans and spans[-1][1] == num - 1:
+                spans[-1][1] = num
+            else:
+                spans.append([num, num])
 
-        if changed:
-            self.storage.sync()
+        retry_at = utcnow() + GAP_RETRY_DELAY
+        with self.gap_lock, self.storage.batch():
+            self.storchild["gaps"].extend(
+                [start, end, retry_at] for start, end in spans)
+
+    def take_due_gaps(self, limit):
+        """
+        Remove up to limit IDs that are due for a retry from the gap index
+        """
+        numbers = []
+        tnow = utcnow()
+        with self.gap_lock, self.storage.batch():
+            gaps = self.storchild["gaps"]
+            while gaps and gaps[0][2] <= tnow and len(numbers) < limit:
+                start, end = gaps[0][0], gaps[0][1]
+                count = min(end - start + 1, limit - len(numbers))
+                numbers.extend(range(start, start + count))
+
+                if start + count > end:
+                    gaps.pop(0)
+                else:
+                    gaps[0][0] = start + count
+
+        return numbers
+
+    def due_gap_count(self):
+        tnow = utcnow()
+        with self.gap_lock:
+            return sum(gap[1] - gap[0] + 1
+                       for gap in self.storchild["gaps"] if gap[2] <= tnow)
+
+    def retry_gaps(self):
+        """
+        Retry the IDs that returned nothing, once there is a full batch of
+        them or nothing else to fetch
+        """
+        # Use the workers that are not fetching new ranges
+        for _ in range(self.workers_limit - len(self.storchild["workers"])):
+            backlog = self.storchild["seen"] - self.storchild["pending"]
+            if backlog > 0 and self.due_gap_count() < self.max_batch:
+                return
+
+            # Leave the remaining requests to more important work
+            if scheduler.should_shed(priority.CATCH_UP) or self.budget_left() == 0:
+                return
+
+            numbers = self.take_due_gaps(self.max_batch)
+            if not numbers:
+                return
+
+            # Skip most retries if they don't find anything
+            self.gap_batches += 1
+            retry_rate = self.storchild["retry_hit_rate"]
+            if retry_rate is not None and retry_rate < GAP_MIN_RETRY_HITS and \
+                    self.gap_batches % GAP_RETRY_SAMPLE:
+                logger.debug("Dropping %d empty %s IDs" %
+                             (len(numbers), self.objtype))
+                continue
+
+            # Retried IDs were already counted
+            self.spend_request(0)
+            self.pool.submit(self.fetch_gaps, numbers)
+
+    def fetch_gaps(self, numbers):
+        """
+        Worker that fetches IDs from the gap index
+        """
+        obj_list = [self.objtype + base36.dumps(num) for num in numbers]
+
+        hits = 0
+        with self.sessions.session() as name, request_priority(priority.CATCH_UP):
+            try:
+                for obj in backend.get_reddit(name).info(obj_list):
+                    hits += 1
+                    self.feed(obj)
+            except Exception as e:
+                logger.error("Error fetching gaps %s: %s" % (obj_list[0], e))
+                backend.get_reddit(name, True)
+
+        with self.gap_lock:
+            self.update_hit_rate("retry_hit_rate", hits, len(numbers))
+
+    def feed(self, obj):
+        if self.item_filter and not self.item_filter(obj):
+            self.filtered += 1
+            return
+
+        if self.recent and not self.recent.add(self.objtype + obj.id):
+            self.duplicates += 1
+            return
+
+        if self.callback:
+            try:
+                self.callback(self.objclass(obj))
+            except:
+                import traceback
+                traceback.print_exc()
+
+    def clean_up_finished(self):
+        """
+        Clean up finished workers
+        """
+        with self.storage.batch():
+            # The first element should always be the one that should be consumed
+            while len(self.storchild["workers"]) > 0 and self.storchild["workers"][0]["finished"] == 1:
+                element = self.storchild["workers"][0]
+
+                self.storchild["fed"] = element["end"]
+                self.storchild["drift"] = self.storchild["seen"] - \
+                    self.storchild["fed"]
+                self.storchild["workers"] = self.storchild["workers"][1:]
+                #print("Ended: %d -> %d" % (element["start"], element["end"]))
+                #print("Pending %d, Fed %d\n" % (self.storchild["pending"], self.storchild["fed"]))
 
     def feed_new_elements(self):
         """
         Trigger creation/cleanup of workers
         """
-        if self.worker_processing:
+        if self.worker_processing or not self.initialized:
             return
 
         try:
             self.worker_processing = True
+
+            # Restart the ranges that were not finished by the last run
+            while self.resume_workers:
+                self.pool.submit(self.catch_up, self.resume_workers.pop(0))
+
+            self.adapt()
             self.create_new_worker()
             self.clean_up_finished()
         except:
@@ -545,25 +1032,56 @@ class BotFeeder():
         """
         Worker that feeds data to the bot
         """
-        obj_list = []
-        obj_gen = None
-        for num in range(worker["start"], worker["end"] + 1):
-            obj_list.append(self.objtype + base36.dumps(num))
-
-        obj_gen = backend.get_reddit().info(obj_list)
-
-        # returns a generator
-        for obj in obj_gen:
-            if self.callback:
+        # Continue after the last saved item if the range was started before
+        start = worker.get("last", worker["start"] - 1) + 1
+        last_checkpoint = time.monotonic()
+
+        requested = set(range(start, worker["end"] + 1))
+        found = set()
+        retries = 0
+        unfetched = 0
+        while True:
+            obj_list = []
+            for num in range(start, worker["end"] + 1):
+                obj_list.append(self.objtype + base36.dumps(num))
+
+            with self.sessions.session() as name, request_priority(priority.CATCH_UP):
                 try:
-                    self.callback(self.objclass(obj))
-                except:
-                    import traceback
-                    traceback.print_exc()
-            self.storage.sync()
-
-        worker["finished"] = 1
-        self.storage.sync()
+                    # returns a generator
+                    for obj in backend.get_reddit(name).info(obj_list):
+                        # Items are returned in the order they were requested
+                        start = base36.loads(obj.id) + 1
+                        found.add(start - 1)
+
+                        self.feed(obj)
+
+                        # Save the progress once in a while
+                        if time.monotonic() - last_checkpoint > FEEDER_CHECKPOINT_INTERVAL:
+                            worker["last"] = start - 1
+                            last_checkpoint = time.monotonic()
+                    break
+                except Exception as e:
+                    # Get a new session and continue after the last fed item
+                    logger.error("Error fetching %s: %s" % (obj_list[0], e))
+                    backend.get_reddit(name, True)
+
+            retries += 1
+            if retries > FETCH_MAX_RETRIES:
+                # Leave the rest of the range to the gap index
+                unfetched = worker["end"] - start + 1
+                logger.error("Giving up on %s IDs %d-%d" %
+                             (self.objtype, start, worker["end"]))
+                break
+            time.sleep(FETCH_RETRY_DELAY)
+
+        with self.gap_lock, self.storage.batch():
+            self.add_gaps(requested - found)
+            # IDs that were never fetched don't count towards the hit rate
+            self.update_hit_rate(
+                "hit_rate", len(found), len(requested) - unfetched)
+
+            # Changing the tracked worker saves the range as finished
+            worker["finished"] = 1
 
 
 class CacheData():
@@ -588,6 +1106,72 @@ class CacheData():
         self.last_check = utcnow()
 
 
+class ThingCache():
+    """
+    Process-wide cache of wrapped items, keyed by fullname (users by
+    USER_KEY_PREFIX + name). Each kind of item expires after its own TTL and
+    the least recently used items are dropped when the cache is full.
+    """
+
+    def __init__(self, max_size, ttls):
+        self.max_size = max_size
+        self.ttls = ttls
+        self.lock = threading.Lock()
+
+        # Maps keys to (expiry time, item), the most recently used ones last
+        self.items = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def ttl(self, key):
+        if key.startswith(COMMENT_PREFIX):
+            return self.ttls["comment_ttl"]
+        elif key.startswith(SUBMISSION_PREFIX):
+            return self.ttls["submission_ttl"]
+        elif key.startswith(USER_KEY_PREFIX):
+            return self.ttls["user_ttl"]
+
+        return 0
+
+    def get(self, key):
+        """
+        Return the cached item or None if it's missing or expired
+        """
+        with self.lock:
+            entry = self.items.get(key)
+            if entry and entry[0] > utcnow():
+                self.items.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            if entry:
+                del self.items[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, item):
+        ttl = self.ttl(key)
+        if ttl <= 0 or self.max_size <= 0:
+            return
+
+        with self.lock:
+            self.items[key] = (utcnow() + ttl, item)
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.items)}
+
+
 class modlog():
     def __init__(self, modlog_item):
         self._raw = modlog_item
@@ -618,17 +1202,19 @@ class modqueue():
         self.target_permalink = self._raw.permalink
         self.target_fullname = self._raw.fullname
 
-        original_item = get_item(self._raw.fullname)
-        self.target_author = None
-        if original_item.author:
-            self.target_author = original_item.author.name
-
         self.item_type = None
         if self._raw.name.startswith(COMMENT_PREFIX):
             self.item_type = comment(self._raw)
         elif self._raw.name.startswith(SUBMISSION_PREFIX):
             self.item_type = submission(self._raw)
 
+        # The queue item is the item itself, so there's no need to fetch it
+        self.target_author = None
+        if self.item_type:
+            thing_cache.put(self._raw.fullname, self.item_type)
+            if self.item_type.author:
+                self.target_author = self.item_type.author.name
+
     @property
     def banned_by(self):
         if self._raw.banned_by:
@@ -640,12 +1226,256 @@ class modqueue():
     def permalink(self):
         return self.item_type.permalink
 
-def scrape_modqueue(subreddit_name):
+
+class ModqueueTracker():
     """
-    Scrape the modqueue for a subreddit
+    Keeps the last seen state of a modqueue. A scan reads the queue from the
+    newest item and stops after MODQUEUE_KNOWN_STOP unchanged items in a
+    row, so usually only new items are fetched. Every
+    MODQUEUE_FULL_SCAN_INTERVAL seconds the whole queue is read, to find
+    changes further down and to drop items that left the queue.
+
+    An item has changed if its reports, its state or the number of days
+    since it was posted changed.
     """
-    for item in backend.get_all_modqueue(subreddit_name):
-        yield modqueue(item)
+
+    def __init__(self, target, fetch=None):
+        self.target = target
+        self.fetch = fetch or backend.get_all_modqueue
+        self.lock = threading.Lock()
+
+        # Maps fullnames to (signature, modqueue item)
+        self.items = {}
+        self.last_full_scan = None
+
+        # Fullnames read by the last scan, in queue order
+        self.last_read = []
+
+    @staticmethod
+    def signature(raw):
+        reports = sum(report[1] for report in getattr(raw, "user_reports", None) or [])
+        mod_reports = len(getattr(raw, "mod_reports", None) or [])
+        age_days = int((utcnow() - raw.created_utc) // timedata.SEC_IN_DAY)
+
+        return (reports, mod_reports, str(raw.banned_by), raw.approved, age_days)
+
+    def scan(self, full=None):
+        """
+        Read the modqueue and return the items that are new or changed
+        :param full: read the whole queue; by default only when the last full
+            scan is older than MODQUEUE_FULL_SCAN_INTERVAL
+        """
+        tnow = utcnow()
+        if full is None:
+            full = self.last_full_scan is None or \
+                tnow - self.last_full_scan > MODQUEUE_FULL_SCAN_INTERVAL
+
+        changed = []
+        seen = {}
+        unchanged = 0
+        with self.lock:
+            try:
+                for raw in self.fetch(self.target):
+                    fullname = raw.fullname
+                    signature = self.signature(raw)
+                    seen[fullname] = None
+
+                    old = self.items.get(fullname)
+                    if old and old[0] == signature:
+                        unchanged += 1
+                        if not full and unchanged >= MODQUEUE_KNOWN_STOP:
+                            break
+                        continue
+
+                    unchanged = 0
+                    item = modqueue(raw)
+                    self.items[fullname] = (signature, item)
+                    changed.append(item)
+            except Exception as e:
+                # Items that were not read are not known to be gone
+                logger.error("Error reading modqueue %s: %s" % (self.target, e))
+                full = False
+
+            if full:
+                for fullname in list(self.items.keys()):
+                    if fullname not in seen:
+                        del self.items[fullname]
+                self.last_full_scan = tnow
+            self.last_read = list(seen)
+
+        return changed
+
+    def read(self):
+        """
+        Return the items read by the last scan, in queue order
+        """
+        with self.lock:
+            return [self.items[fullname][1] for fullname in self.last_read
+                    if fullname in self.items]
+
+    def tracked(self, subreddit_name=None):
+        """
+        Return the items that are in the queue as of the last scan, all of
+        them or only the ones of a subreddit
+        """
+        with self.lock:
+            return [item for _, item in self.items.values()
+                    if subreddit_name in [None, item.subreddit_name]]
+
+    def discard(self, fullname):
+        """
+        Stop tracking an item, e.g. after it was approved or removed
+        """
+        with self.lock:
+            self.items.pop(fullname, None)
+
+
+def scan_modqueue():
+    """
+    Read the modqueue of all moderated subreddits at once and feed every
+    item to the bot, telling whether it is new or changed since the last
+    pass
+    """
+    with request_priority(priority.MODQUEUE):
+        changed = set(id(item) for item in modqueue_tracker.scan(full=True))
+
+    for item in modqueue_tracker.read():
+        try:
+            modqueue_feeder(item, id(item) in changed)
+        except:
+            import traceback
+            traceback.print_exc()
+
+
+def get_modqueue(subreddit_name):
+    """
+    Get the modqueue of a subreddit, as of the last scan
+    """
+    return modqueue_tracker.tracked(subreddit_name)
+
+
+class RecentItems():
+    """
+    The last max_size fullnames that were fed, shared by the sources that
+    can return the same item
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.items = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, fullname):
+        """
+        Remember an item; return False if it was already there
+        """
+        with self.lock:
+            if fullname in self.items:
+                return False
+
+            self.items[fullname] = None
+            if len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+            return True
+
+
+class SubredditPoller():
+    """
+    Reads the newest submissions of the moderated subreddits, which finds
+    them sooner and with fewer requests than walking the IDs of /r/all.
+
+    Subreddits are joined in multireddits (r/sub1+sub2) of up to
+    MULTIREDDIT_MAX_LEN characters. Each multireddit is read with the newest
+    submission seen so far as cursor, so that only newer ones are returned.
+    The first read only sets the cursor, older submissions are left to the
+    /r/all feeder.
+
+    A cursor that was removed makes reddit return nothing. After
+    SUBREDDIT_CURSOR_CHECK empty reads, the newest submissions are read
+    without cursor and the ones with a higher ID are fed.
+    """
+
+    def __init__(self, feed, fetch=None):
+        self.feed = feed
+        self.fetch = fetch or backend.get_subreddit_new
+        self.lock = threading.Lock()
+
+        # Maps multireddit names to their cursor
+        self.cursors = {}
+
+    @staticmethod
+    def group(subreddit_names):
+        """
+        Join subreddit names in multireddit names
+        """
+        groups = []
+        crt = []
+        for name in sorted(subreddit_names, key=str.lower):
+            if crt and len("+".join(crt + [name])) > MULTIREDDIT_MAX_LEN:
+                groups.append("+".join(crt))
+                crt = []
+            crt.append(name)
+
+        if crt:
+            groups.append("+".join(crt))
+
+        return groups
+
+    def set_subreddits(self, subreddit_names):
+        """
+        Update the multireddits, keeping the cursors of the unchanged ones
+        """
+        self.cursors = {name: self.cursors.get(name, {"before": None, "empty": 0})
+                        for name in self.group(subreddit_names)}
+
+    def read(self, name, cursor):
+        """
+        Read a multireddit and return the new submissions, oldest first
+        """
+        check = cursor["before"] is None or cursor["empty"] >= SUBREDDIT_CURSOR_CHECK
+
+        # Newest first
+        items = list(self.fetch(name, None if check else cursor["before"]))
+
+        if check:
+            cursor["empty"] = 0
+            new = []
+            if cursor["before"]:
+                last_id = base36.loads(cursor["before"][len(SUBMISSION_PREFIX):])
+                new = [item for item in items if base36.loads(item.id) > last_id]
+        elif items:
+            cursor["empty"] = 0
+            new = items
+        else:
+            cursor["empty"] += 1
+            new = []
+
+        if items:
+            cursor["before"] = SUBMISSION_PREFIX + items[0].id
+
+        return list(reversed(new))
+
+    def poll(self, subreddit_names):
+        new = []
+        with self.lock:
+            self.set_subreddits(subreddit_names)
+
+            for name, cursor in self.cursors.items():
+                try:
+                    new.extend(self.read(name, cursor))
+                except Exception as e:
+                    logger.error("Error reading r/%s: %s" % (name, e))
+
+        for raw in new:
+            self.feed(raw)
+
+
+def poll_moderated_subs():
+    """
+    Feed the new submissions of the moderated subreddits
+    """
+    subreddit_poller.poll(get_moderated_subs())
 
 def get_bot_account_name():
     """
@@ -672,17 +1502,26 @@ def set_input_type(input_type):
     global subreddit_cache
     global report_cmds
     global cache_data
-    global modlog_hist
+    global modlog_reader
+    global posted_things_body
+    global thing_cache
+    global modqueue_tracker
+    global report_tracker
 
     backend = importlib.import_module("modbot.input.%s" % input_type)
 
     # Initialize objects that depend on the backend
-    all_data = dsdict("all", "last_seen")  # Last seen /r/all subs and comms
+    # Bot state is not meant to be read by humans, so skip pretty printing
+    all_data = get_stored_dict("all", "last_seen", "fast")  # Last seen /r/all subs and comms
     wiki_storages = {}
     subreddit_cache = {}
     cache_data = {}
-    report_cmds = dsdict("mod", "cmds")
-    modlog_hist = dsdict("mod", "modlog")
+    thing_cache = ThingCache(cache_opts["size"], cache_opts)
+    modqueue_tracker = ModqueueTracker("mod")
+    report_tracker = ReportTracker("mod")
+    report_cmds = get_stored_dict("mod", "cmds", "fast")
+    modlog_reader = ModlogReader("mod", get_stored_dict("mod", "modlog", "fast"))
+    posted_things_body = get_stored_dict("all", "posted", lazy=True)
 
 
 def set_credentials(credentials, user_agent):
@@ -702,9 +1541,36 @@ def get_subreddit(name):
 
 
 def get_user(name):
-    if name:
-        return user(backend.get_reddit().redditor(name))
-    return None
+    if not name:
+        return None
+
+    key = USER_KEY_PREFIX + name.lower()
+    cached = thing_cache.get(key)
+    if cached:
+        return cached
+
+    item = user(backend.get_reddit().redditor(name))
+    thing_cache.put(key, item)
+    return item
+
+
+def get_cache_stats():
+    """
+    Return the hit and miss counters of the item cache
+    """
+    return thing_cache.stats()
+
+
+def get_feeder_stats():
+    """
+    Return how much of the /r/all submission and comment streams was fetched
+    """
+    stats = {}
+    for feeder in [sub_feeder, com_feeder]:
+        if feeder:
+            stats[feeder.objtype] = feeder.stats()
+
+    return stats
 
 
 def get_moderated_subs():
@@ -760,20 +1626,98 @@ def get_item(item_id):
     Gets an item by id.
     ID needs to contain the type: i.e. t1_1234
     """
+    cached = thing_cache.get(item_id)
+    if cached:
+        return cached
+
     items = backend.get_reddit().info([item_id])
     # return immediately as we requested only one item
     for item in items:
         if type(item) == backend.praw.models.Comment:
-            return comment(item)
+            wrapped = comment(item)
         elif type(item) == backend.praw.models.Submission:
-            return submission(item)
+            wrapped = submission(item)
+        else:
+            continue
+
+        thing_cache.put(item_id, wrapped)
+        return wrapped
+
+def to_fullname(item_id):
+    """
+    Convert a submission shortlink or URL to a fullname. Fullnames are
+    returned as they are.
+    """
+    if item_id.startswith(COMMENT_PREFIX) or item_id.startswith(SUBMISSION_PREFIX):
+        return item_id
+
+    parts = [part for part in item_id.split("?")[0].split("/") if part]
+    if "comments" in parts:
+        return SUBMISSION_PREFIX + parts[parts.index("comments") + 1]
+
+    return SUBMISSION_PREFIX + parts[-1]
+
+
+def get_items(item_ids, fresh=False):
+    """
+    Get the current state of many items, with one request for each
+    INFO_MAX_IDS items.
+    :param item_ids: fullnames (e.g. t3_1234) or submission shortlinks
+    :param fresh: fetch all items, even if cached; for callers that act on
+        changes made in the last seconds
+    :return: dictionary of wrapped items keyed by the given IDs; items that
+        were not found are missing
+    """
+    by_fullname = {}
+    for item_id in item_ids:
+        by_fullname.setdefault(to_fullname(item_id), []).append(item_id)
+
+    items = {}
+    fullnames = []
+    for fullname, ids in by_fullname.items():
+        cached = None if fresh else thing_cache.get(fullname)
+        if not cached:
+            fullnames.append(fullname)
+            continue
+
+        for item_id in ids:
+            items[item_id] = cached
+
+    for idx in range(0, len(fullnames), INFO_MAX_IDS):
+        chunk = fullnames[idx:idx + INFO_MAX_IDS]
+        for item in backend.get_reddit().info(chunk):
+            if item.fullname.startswith(COMMENT_PREFIX):
+                wrapped = comment(item)
+            else:
+                wrapped = submission(item)
+
+            thing_cache.put(item.fullname, wrapped)
+            for item_id in by_fullname.get(item.fullname, []):
+                items[item_id] = wrapped
+
+    return items
+
 
 def get_comment(id):
-    return comment(backend.get_reddit().comment(id=id))
+    fullname = COMMENT_PREFIX + id
+    cached = thing_cache.get(fullname)
+    if cached:
+        return cached
+
+    item = comment(backend.get_reddit().comment(id=id))
+    thing_cache.put(fullname, item)
+    return item
+
 
+def get_submission(url, fresh=False):
+    fullname = to_fullname(url)
+    cached = None if fresh else thing_cache.get(fullname)
+    if cached:
+        return cached
 
-def get_submission(url):
-    return submission(backend.get_reddit().submission(url=url))
+    item = submission(backend.get_reddit().submission(url=url))
+    thing_cache.put(fullname, item)
+    return item
 
 
 def format_string(to_format):
@@ -814,6 +1758,9 @@ def post_submission_text(sub_name, title, body, sticky):
         except:
             audit.error("Error stickying post")
 
+    # The checked copy is outdated after approving or stickying
+    check_posted.invalidate()
+
     bot_posted = submission(posted)
     posted_things_body[bot_posted.shortlink] = body
     return bot_posted
@@ -824,17 +1771,14 @@ def new_report(item, author, body):
     Check if an item can be added in the report feeder
     """
     def add_item():
-        if item.id not in report_cmds:
-            report_cmds[item.id] = {}
-
-        if "/created_utc" not in report_cmds[item.id]:
-            report_cmds[item.id]["/created_utc"] = item.created_utc
+        with report_cmds.batch():
+            if item.id not in report_cmds:
+                cmds[item.id] = {"/created_utc": item.created_utc}
 
-        if author not in report_cmds[item.id]:
-            report_cmds[item.id][author] = [body]
-        else:
-            report_cmds[item.id][author].append(body)
-        report_cmds.sync()
+            if author not in report_cmds[item.id]:
+                report_cmds[item.id][author] = [body]
+            else:
+                report_cmds[item.id][author].append(body)
 
     if not author:
         return
@@ -843,11 +1787,8 @@ def new_report(item, author, body):
     if utcnow() - item.created_utc > timedata.SEC_IN_WEEK:
         return
 
-    # Clean up items older than a week
-    for key, val in list(report_cmds.items()):
-        if utcnow() - val["/created_utc"] > timedata.SEC_IN_WEEK:
-            del report_cmds[key]
-            report_cmds.sync()
+    cmds = report_cmds.expiring(
+        timedata.SEC_IN_WEEK, lambda val: val["/created_utc"])
 
     new_item = False
     # If the item wasn't there before, add it
@@ -869,38 +1810,212 @@ def new_report(item, author, body):
         report_feeder(report(item, get_user(author), body))
 
 
-def new_modlog_item(item):
-    if item.id not in modlog_hist:
-        modlog_hist[item.id] = item.created_utc
-        modlog_feeder(modlog(item))
+class ReportTracker():
+    """
+    Keeps the mod reports last seen on each reported item. A scan reads the
+    reports listing from the top and stops after REPORTS_KNOWN_STOP
+    unchanged items in a row, so only items with new reports are looked at
+    and the next pages are not requested. Every REPORTS_FULL_SCAN_INTERVAL
+    seconds the whole listing is read, to drop the items that left it.
+    """
+
+    def __init__(self, target, fetch=None):
+        self.target = target
+        self.fetch = fetch or backend.get_all_reports
+        self.lock = threading.Lock()
+
+        # Maps fullnames to the (reason, author) pairs of their mod reports
+        self.items = {}
+        self.last_full_scan = None
+
+    @staticmethod
+    def fingerprint(raw):
+        return frozenset(tuple(mod_report) for mod_report in
+                         getattr(raw, "mod_reports", None) or [])
+
+    def scan(self, full=None):
+        """
+        Read the reports and return the new mod reports as
+        (item, author, reason)
+        """
+        tnow = utcnow()
+        if full is None:
+            full = self.last_full_scan is None or \
+                tnow - self.last_full_scan > REPORTS_FULL_SCAN_INTERVAL
+
+        new_reports = []
+        seen = set()
+        unchanged = 0
+        with self.lock:
+            try:
+                for raw in self.fetch(self.target):
+                    fullname = raw.fullname
+                    fingerprint = self.fingerprint(raw)
+                    seen.add(fullname)
+
+                    old = self.items.get(fullname, frozenset())
+                    if fullname in self.items and old == fingerprint:
+                        unchanged += 1
+                        if not full and unchanged >= REPORTS_KNOWN_STOP:
+                            break
+                        continue
+
+                    unchanged = 0
+                    self.items[fullname] = fingerprint
+                    for reason, author in fingerprint - old:
+                        new_reports.append((raw, author, reason))
+            except Exception as e:
+                # Items that were not read are not known to be gone
+                logger.error("Error reading reports %s: %s" % (self.target, e))
+                full = False
+
+            if full:
+                for fullname in list(self.items.keys()):
+                    if fullname not in seen:
+                        del self.items[fullname]
+                self.last_full_scan = tnow
+
+        return new_reports
+
+
+def scan_reports():
+    """
+    Read the reports of all moderated subreddits and feed the new mod
+    reports to the bot
+    """
+    with request_priority(priority.REPORTS):
+        new_reports = report_tracker.scan()
+
+    for item, author, reason in new_reports:
+        try:
+            new_report(item, author, reason)
+        except:
+            import traceback
+            traceback.print_exc()
+
+    # Clean up items older than a week
+    if is_expired("report_cmds"):
+        report_cmds.expiring(
+            timedata.SEC_IN_WEEK, lambda val: val["/created_utc"]).expire(utcnow())
+        cache_data["report_cmds"].mark_updated()
+
+
+class ModlogReader():
+    """
+    Reads the modlog from a cursor, the newest entry seen so far, so that
+    only newer entries are requested. The cursor is saved after the entries
+    were fed and is used again after a restart. If there are more new
+    entries than fit in a page, up to MODLOG_MAX_PAGES are read at once.
+
+    A cursor that is no longer in the modlog makes reddit return nothing.
+    After MODLOG_CURSOR_CHECK empty reads, the newest page is read without
+    cursor and the entries created after the cursor are fed.
+
+    Entries are fed oldest first and the last MODLOG_RECENT_SIZE IDs are
+    kept in case an entry is returned twice.
+    """
+
+    def __init__(self, target, storage, fetch=None):
+        self.target = target
+        self.storage = storage
+        self.fetch = fetch or backend.get_modlog
+        self.recent = RecentItems(MODLOG_RECENT_SIZE)
+        self.empty = 0
+        self.lock = threading.Lock()
+
+        # Older versions stored the creation time of each entry
+        old_keys = [key for key in storage if key not in ["newest", "created"]]
+        if old_keys:
+            with storage.batch():
+                if "created" not in storage:
+                    storage["created"] = max(storage[key] for key in old_keys)
+                for key in old_keys:
+                    del storage[key]
+
+    def read_new(self, before):
+        """
+        Return the entries after the cursor, newest first
+        """
+        entries = []
+        for _ in range(MODLOG_MAX_PAGES):
+            page = list(self.fetch(self.target, before, MODLOG_PAGE_SIZE))
+            entries = page + entries
+
+            if len(page) < MODLOG_PAGE_SIZE:
+                break
+            before = page[0].id
 
-    to_delete = []
-    for key, val in modlog_hist.items():
-        if utcnow() - val > timedata.SEC_IN_DAY * 7:
-            to_delete.append(key)
+        return entries
 
-    for key in to_delete:
-        del modlog_hist[key]
+    def read(self, feed):
+        """
+        Feed the new entries and move the cursor
+        """
+        with self.lock:
+            before = self.storage.get("newest")
+            if before is None or self.empty >= MODLOG_CURSOR_CHECK:
+                self.empty = 0
+                entries = list(self.fetch(self.target, None, MODLOG_PAGE_SIZE))
+
+                created = self.storage.get("created")
+                if created is not None:
+                    entries = [entry for entry in entries if entry.created_utc > created]
+            else:
+                entries = self.read_new(before)
+                if not entries:
+                    self.empty += 1
+                    return
+                self.empty = 0
 
+            for entry in reversed(entries):
+                if self.recent.add(entry.id):
+                    feed(entry)
 
-def new_modqueue_item(item):
-    modqueue_feeder(modqueue(item))
+            if entries:
+                with self.storage.batch():
+                    self.storage["newest"] = entries[0].id
+                    self.storage["created"] = entries[0].created_utc
+
+
+def new_modlog_item(item):
+    try:
+        modlog_feeder(modlog(item))
+    except:
+        import traceback
+        traceback.print_exc()
+
+
+def read_modlog():
+    """
+    Feed the modlog entries of all moderated subreddits that are newer than
+    the last read
+    """
+    modlog_reader.read(new_modlog_item)
 
 
-def watch_all(sub_func, comm_func, inbox_func, report_func, modlog_func, modqueue_func):
+def watch_all(sub_func, comm_func, inbox_func, report_func, modlog_func, modqueue_func,
+              sub_filter=None, comm_filter=None):
     global sub_feeder
     global com_feeder
     global inbox_feeder
+    global inbox_pool
     global report_feeder
     global modlog_feeder
     global modqueue_feeder
+    global subreddit_poller
     global rpc_server
 
     # Initialize feeder classes
-    sub_feeder = BotFeeder(all_data, SUBMISSION_PREFIX, sub_func, submission, 10, 99)
-    com_feeder = BotFeeder(all_data, COMMENT_PREFIX, comm_func, comment, 10, 99)
+    opts = dict(feeder_opts)
+    comment_budget = opts.pop("comment_requests_per_min")
+    moderated_subs_interval = opts.pop("moderated_subs_interval")
+    sub_feeder = BotFeeder(all_data, SUBMISSION_PREFIX, sub_func, submission,
+                           item_filter=sub_filter, recent=RecentItems(RECENT_FED_SIZE), **opts)
+    com_feeder = BotFeeder(all_data, COMMENT_PREFIX, comm_func, comment,
+                           item_filter=comm_filter, request_budget=comment_budget, **opts)
 
     inbox_feeder = inbox_func
+    inbox_pool = BotThreadPool(INBOX_WORKERS, "inbox")
     report_feeder = report_func
     modlog_feeder = modlog_func
     modqueue_feeder = modqueue_func
@@ -911,6 +2026,13 @@ def watch_all(sub_func, comm_func, inbox_func, report_func, modlog_func, modqueu
         target=backend.thread_sub,
         args=(sub_feeder,))
 
+    if moderated_subs_interval:
+        subreddit_poller = SubredditPoller(sub_feeder.feed)
+        BotThread(
+            name="submissions_moderated",
+            target=backend.thread_moderated_subs,
+            args=(poll_moderated_subs, moderated_subs_interval))
+
     BotThread(
         name="comments_all",
         target=backend.thread_comm,
@@ -919,17 +2041,59 @@ def watch_all(sub_func, comm_func, inbox_func, report_func, modlog_func, modqueu
     BotThread(
         name="reports_mod",
         target=backend.thread_reports,
-        args=(new_report,))
+        args=(scan_reports,))
 
     BotThread(
         name="modlog_thread",
         target=backend.thread_modlog,
-        args=(new_modlog_item,))
+        args=(read_modlog,))
 
     BotThread(
         name="modqueue_thread",
         target=backend.thread_modqueue,
-        args=(new_modqueue_item,))
+        args=(scan_modqueue,))
+
+
+def run_inbox_commands(messages):
+    """
+    Give the messages of one author to the bot, in the order they were sent
+    """
+    with request_priority(priority.COMMAND):
+        for message in messages:
+            try:
+                inbox_feeder(inboxmessage(message))
+            except:
+                import traceback
+                traceback.print_exc()
+
+
+def read_inbox():
+    """
+    Read all unread messages page by page, mark them as read in batches and
+    run the commands in the inbox pool. Messages of the same author are run
+    one after the other.
+    """
+    if not inbox_feeder:
+        return
+
+    # Commands sent to the bot go first
+    with request_priority(priority.COMMAND):
+        inbox = backend.get_reddit().inbox
+
+        # Read all pages before marking anything, as marking changes the
+        # unread listing that is being paged through
+        messages = list(inbox.unread(limit=None))
+
+        for pos in range(0, len(messages), INBOX_MARK_READ_BATCH):
+            inbox.mark_read(messages[pos:pos + INBOX_MARK_READ_BATCH])
+
+    by_author = collections.OrderedDict()
+    for message in messages:
+        if message.author:
+            by_author.setdefault(str(message.author), []).append(message)
+
+    for author_messages in by_author.values():
+        inbox_pool.submit(run_inbox_commands, author_messages)
 
 
 def check_inbox(tnow):
@@ -937,15 +2101,11 @@ def check_inbox(tnow):
     Check the inbox for updates
     """
     def _check_inbox():
-        # For each unread message
-        for message in backend.get_reddit().inbox.unread(limit=None):
-            if inbox_feeder:
-                # Mark message as read
-                message.mark_read()
-
-                # Give it to the bot
-                if message.author:
-                    inbox_feeder(inboxmessage(message))
+        try:
+            read_inbox()
+        except:
+            import traceback
+            traceback.print_exc()
 
     global inbox_thread
     if inbox_thread and inbox_thread.isAlive():
@@ -985,6 +2145,28 @@ def start_tick(period, call_per):
         args=(period, tick,))
 
 
+def set_feeder_opts(opts):
+    """
+    Set the limits within which the feeders adapt
+    """
+    for name, value in opts.items():
+        if name not in feeder_opts:
+            raise ValueError("Invalid feeder option %s" % name)
+
+        feeder_opts[name] = type(feeder_opts[name])(value)
+
+
+def set_cache_opts(opts):
+    """
+    Set the size of the item cache and how long each kind of item is kept
+    """
+    for name, value in opts.items():
+        if name not in cache_opts:
+            raise ValueError("Invalid cache option %s" % name)
+
+        cache_opts[name] = int(value)
+
+
 def set_signature(signature):
     global bot_signature
     bot_signature = signature
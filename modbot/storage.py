@@ -1,11 +1,28 @@
 import os
+import abc
 import json
+import atexit
+import contextlib
 import collections
+import collections.abc
 import platform
 import shutil
+import threading
+import time
+import hashlib
+import heapq
 from modbot.log import botlog, loglevel
 from shutil import copyfile
-from oslo_concurrency import lockutils
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 logger = botlog(
     "storage.log",
@@ -14,22 +31,502 @@ logger = botlog(
 
 DS_LOC = "storage_data/"
 
+# Default write-behind interval in seconds. If set to None, each sync writes
+# the file immediately.
+WRITE_BEHIND_INTERVAL = None
+
+# Backend used by get_stored_dict: "json", "journal" or "sqlite"
+STORAGE_BACKEND = "json"
+
+# Number of journal records after which the journal is compacted
+JOURNAL_COMPACT_RECORDS = 1000
+
+# Default serializer for storage files, see SERIALIZERS
+STORAGE_SERIALIZER = "pretty"
+
+# Number of decoded values kept in memory by lazily loaded dictionaries
+LAZY_CACHE_SIZE = 1000
+
 dsdict_cache = {}
 
+# How often the flusher thread checks for objects that are due
+FLUSHER_PERIOD = 1
 
-def get_stored_dict(parent, name):
+# Objects that have pending changes and are waiting for the flusher
+dirty_objs = {}
+dirty_lock = threading.Lock()
+flusher_thread = None
+flusher_stop = threading.Event()
+
+# Storage objects changed inside deferred_writes, per thread
+deferred = threading.local()
+
+
+def get_stored_dict(parent, name, serializer=None, lazy=False):
+    """
+    Get the storage dictionary for parent/name
+    :param serializer: serializer name for file based backends; it is only
+        used by the first call for a given dictionary
+    :param lazy: for large dictionaries that are read more than written;
+        values are only loaded when accessed
+    """
     path = "%s/%s" % (parent, name)
 
     if path not in dsdict_cache:
-        dsdict_cache[path] = dsdict(parent, name)
+        if lazy and STORAGE_BACKEND != "sqlite":
+            from modbot.storage_lazy import dslazy
+            dsdict_cache[path] = dslazy(parent, name)
+        elif STORAGE_BACKEND == "sqlite":
+            from modbot.storage_sqlite import sqlitedict
+            dsdict_cache[path] = sqlitedict(parent, name)
+        elif STORAGE_BACKEND == "journal":
+            dsdict_cache[path] = dsjournal(
+                parent, name, serializer=serializer)
+        else:
+            dsdict_cache[path] = dsdict(parent, name, serializer=serializer)
 
     return dsdict_cache[path]
 
 
+class dsserializer():
+    """
+    Converts storage data to the file contents and back
+    """
+
+    def __init__(self, name, ext, dumps, loads):
+        self.name = name
+        self.ext = ext
+        self.dumps = dumps
+        self.loads = loads
+
+
+def json_pretty(obj):
+    return json.dumps(obj, indent=4, sort_keys=True).encode()
+
+
+def json_compact(obj):
+    return json.dumps(obj, separators=(",", ":")).encode()
+
+
+SERIALIZERS = {
+    # Indented and sorted, for files that are inspected by humans
+    "pretty": dsserializer("pretty", ".json", json_pretty, json.loads),
+    "compact": dsserializer("compact", ".json", json_compact, json.loads),
+}
+
+if orjson:
+    SERIALIZERS["orjson"] = dsserializer(
+        "orjson", ".json",
+        lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS),
+        orjson.loads)
+
+if msgpack:
+    SERIALIZERS["msgpack"] = dsserializer(
+        "msgpack", ".msgpack",
+        msgpack.packb,
+        lambda data: msgpack.unpackb(data, strict_map_key=False))
+
+# Serializers that are used if an optional module is not installed
+SERIALIZER_FALLBACK = {
+    "orjson": "compact",
+    "msgpack": "compact",
+    # Fastest available serializer that still writes JSON
+    "fast": "orjson" if orjson else "compact",
+}
+
+
+def get_serializer(name=None):
+    """
+    Get a serializer by name
+    """
+    if not name:
+        name = STORAGE_SERIALIZER
+
+    if name not in SERIALIZERS and name not in SERIALIZER_FALLBACK:
+        raise ValueError("Invalid storage serializer %s" % name)
+
+    if name not in SERIALIZERS:
+        fallback = SERIALIZER_FALLBACK[name]
+        if name != "fast":
+            logger.error("Serializer %s is not installed, using %s" %
+                         (name, fallback))
+        name = fallback
+
+    return SERIALIZERS[name]
+
+
+class lockmanager():
+    """
+    Hands out one lock per path, so that a file is never written by two
+    threads at the same time
+    """
+
+    def __init__(self):
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        with self.lock:
+            if path not in self.locks:
+                self.locks[path] = threading.RLock()
+
+            return self.locks[path]
+
+
+path_locks = lockmanager()
+
+
+class trackeddict(dict):
+    """
+    Dictionary stored inside a storage object. Reports changes to the
+    storage object that contains it, along with the keys that changed.
+    """
+    __slots__ = ("_root", "_path", "_top")
+
+    def __reduce_ex__(self, protocol):
+        # Copies are regular dictionaries
+        return (dict, (dict(self),))
+
+    def _changed(self, keys=None):
+        self._root.changed(self._path, self._top, keys)
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, track(value, self._root, self._path + (key,), self._top))
+        self._changed([key])
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed([key])
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        values = dict(*args, **kwargs)
+        for key, value in values.items():
+            dict.__setitem__(self, key, track(value, self._root, self._path + (key,), self._top))
+        self._changed(list(values.keys()))
+
+    def pop(self, *args):
+        value = dict.pop(self, *args)
+        self._changed([args[0]])
+        return value
+
+    def popitem(self):
+        value = dict.popitem(self)
+        self._changed([value[0]])
+        return value
+
+    def clear(self):
+        dict.clear(self)
+        self._changed()
+
+
+class trackedlist(list):
+    """
+    List stored inside a storage object. Reports changes to the storage
+    object that contains it.
+    """
+    __slots__ = ("_root", "_path", "_top")
+
+    def __reduce_ex__(self, protocol):
+        # Copies are regular lists
+        return (list, (list(self),))
+
+    def _changed(self):
+        self._root.changed(self._path, self._top)
+
+    def _track(self, value):
+        # Elements of a list are reported with the path of the list
+        return track(value, self._root, self._path, self._top)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            list.__setitem__(self, index, [self._track(i) for i in value])
+        else:
+            list.__setitem__(self, index, self._track(value))
+        self._changed()
+
+    def __delitem__(self, index):
+        list.__delitem__(self, index)
+        self._changed()
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def __imul__(self, count):
+        list.__imul__(self, count)
+        self._changed()
+        return self
+
+    def append(self, value):
+        list.append(self, self._track(value))
+        self._changed()
+
+    def extend(self, values):
+        list.extend(self, [self._track(i) for i in values])
+        self._changed()
+
+    def insert(self, index, value):
+        list.insert(self, index, self._track(value))
+        self._changed()
+
+    def pop(self, *args):
+        value = list.pop(self, *args)
+        self._changed()
+        return value
+
+    def remove(self, value):
+        list.remove(self, value)
+        self._changed()
+
+    def clear(self):
+        list.clear(self)
+        self._changed()
+
+    def sort(self, *args, **kwargs):
+        list.sort(self, *args, **kwargs)
+        self._changed()
+
+    def reverse(self):
+        list.reverse(self)
+        self._changed()
+
+
+def track(value, root, path, top=None):
+    """
+    Convert dictionaries and lists to containers that report changes to root.
+    The value is copied, so changes made through the object that was stored
+    are not seen: after d = {}; storage["x"] = d, use storage["x"]["a"] = 1
+    instead of d["a"] = 1.
+    :param top: the container stored at the top level key of path, which is
+        reported along with each change; a new top level container by default
+    """
+    if isinstance(value, (trackeddict, trackedlist)) and \
+            value._root is root and value._path == path:
+        return value
+
+    if isinstance(value, dict):
+        new = trackeddict()
+    elif isinstance(value, list):
+        new = trackedlist()
+    else:
+        return value
+
+    new._root = root
+    new._path = path
+    new._top = new if top is None else top
+
+    if isinstance(value, dict):
+        for key, item in value.items():
+            dict.__setitem__(new, key, track(item, root, path + (key,), new._top))
+    else:
+        list.extend(new, [track(item, root, path, new._top) for item in value])
+
+    return new
+
+
+class dstracked(abc.ABC):
+    """
+    Storage object that hands out tracked nested containers. Changes to
+    nested values are reported through changed() and persisted with
+    persist_keys(), so callers do not need to call sync() by hand.
+
+    Changes are passed to persist_keys() as a dictionary that maps each
+    changed top level key to the set of its changed child keys, or to None
+    when the whole value changed. Backends that store top level values as
+    a whole can treat it as a list of keys.
+    """
+
+    def init_tracking(self):
+        self.batch_depth = 0
+        self.batch_changes = {}
+        self.batch_lock = threading.Lock()
+        self.expiring_maps = {}
+
+    def track_data(self):
+        self.init_tracking()
+
+        for key, value in self.data.items():
+            self.data[key] = track(value, self, (key,))
+
+    def changed(self, path, top=None, keys=None):
+        """
+        Called when the value found at path has been changed
+        :param top: the value of the top level key that contains it
+        :param keys: the keys that changed in the dictionary found at path,
+            None if the whole value changed
+        """
+        if len(path) > 1:
+            children = {path[1]}
+        elif keys is not None:
+            children = set(keys)
+        else:
+            children = None
+        changes = {path[0]: children}
+
+        with self.batch_lock:
+            if self.batch_depth:
+                merge_changes(self.batch_changes, changes)
+                return
+
+        self.persist_or_defer(changes)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Persist all the changes made inside the block at once
+        """
+        with self.batch_lock:
+            self.batch_depth += 1
+
+        try:
+            yield self
+        finally:
+            changes = None
+            with self.batch_lock:
+                self.batch_depth -= 1
+                if self.batch_depth == 0:
+                    changes = self.batch_changes
+                    self.batch_changes = {}
+
+            if changes:
+                self.persist_or_defer(changes)
+
+    def persist_or_defer(self, changes):
+        """
+        Persist the given changes, or hold them back until the
+        deferred_writes block of the current thread ends
+        """
+        if getattr(deferred, "depth", 0):
+            merge_changes(
+                deferred.objs.setdefault(id(self), (self, {}))[1], changes)
+            return
+
+        self.persist_keys(changes)
+
+    @abc.abstractmethod
+    def persist_keys(self, changes):
+        """
+        Persist the given changes, see the class documentation
+        """
+
+    def expiring(self, max_age, get_time=None, key=None):
+        """
+        Get an expiringmap over this object, or over the dictionary stored
+        at key. The map is created once and reused by later calls.
+        """
+        store = self if key is None else self[key]
+
+        emap = self.expiring_maps.get(key)
+        if not emap or emap.store is not store:
+            emap = expiringmap(store, max_age, get_time)
+            self.expiring_maps[key] = emap
+
+        emap.max_age = max_age
+        return emap
+
+
+def merge_changes(into, changes):
+    """
+    Merge changes, as passed to persist_keys(), into another dictionary of
+    changes
+    """
+    for key, children in changes.items():
+        if key in into and into[key] is None:
+            continue
+
+        if children is None:
+            into[key] = None
+        else:
+            into.setdefault(key, set()).update(children)
+
+
+class expiringmap(collections.abc.MutableMapping):
+    """
+    View over a storage dictionary whose items expire max_age seconds after
+    the time returned by get_time(value). Times are kept in a heap so that
+    expire() only looks at the items that have expired.
+    """
+
+    def __init__(self, store, max_age, get_time=None):
+        self.store = store
+        self.max_age = max_age
+        self.get_time = get_time or (lambda value: value)
+        self.lock = threading.Lock()
+        self.rebuild()
+
+    def rebuild(self):
+        with self.lock:
+            self.heap = [(self.get_time(value), key)
+                         for key, value in self.store.items()]
+            heapq.heapify(self.heap)
+
+    def __getitem__(self, key):
+        return self.store[key]
+
+    def __setitem__(self, key, value):
+        self.store[key] = value
+        with self.lock:
+            heapq.heappush(self.heap, (self.get_time(value), key))
+
+        # Drop entries of overwritten or deleted items once in a while
+        if len(self.heap) > 2 * len(self.store) + 100:
+            self.rebuild()
+
+    def __delitem__(self, key):
+        del self.store[key]
+
+    def __iter__(self):
+        return iter(self.store)
+
+    def __len__(self):
+        return len(self.store)
+
+    def expire(self, tnow):
+        """
+        Remove the items older than max_age and return their keys
+        """
+        expired = []
+        with self.lock:
+            while self.heap and tnow - self.heap[0][0] > self.max_age:
+                created, key = heapq.heappop(self.heap)
+                if key not in self.store:
+                    continue
+
+                # The item could have been replaced or changed in place
+                current = self.get_time(self.store[key])
+                if current == created:
+                    expired.append(key)
+                else:
+                    heapq.heappush(self.heap, (current, key))
+
+        if expired:
+            root = getattr(self.store, "_root", self.store)
+            batch = root.batch() if hasattr(root, "batch") \
+                else contextlib.nullcontext()
+            with batch:
+                for key in expired:
+                    self.store.pop(key, None)
+
+        return expired
+
+
 class dstype():
-    def __init__(self, parent, name):
-        if not name.endswith(".json"):
-            name = name + ".json"
+    def __init__(self, parent, name, write_behind=None, serializer=None):
+        self.serializer = get_serializer(serializer)
+
+        if name.endswith(".json"):
+            name = name[:-len(".json")]
+        json_name = name + ".json"
+        name = name + self.serializer.ext
 
         parent = DS_LOC + parent
         logger.debug("Initializing %s, %s" % (parent, name))
@@ -39,23 +536,73 @@ class dstype():
         self.location = parent + "/" + name
         self.backup_name = parent + "/backup/" + name
 
-        data_obj = self.get_obj(self.location)
+        # Interval at which pending changes are written to disk
+        if write_behind is None:
+            write_behind = WRITE_BEHIND_INTERVAL
+        self.write_behind = write_behind
+        self.last_flush = time.monotonic()
+
+        # Pick up the JSON file when switching to a different file format
+        location = self.location
+        if not os.path.isfile(location) and \
+                os.path.isfile(parent + "/" + json_name):
+            logger.info("Converting %s/%s to %s" %
+                        (parent, json_name, self.serializer.name))
+            location = parent + "/" + json_name
+            self.backup_name = parent + "/backup/" + json_name
+            self.serializer = get_serializer("pretty")
+
+        data_obj = self.get_obj(location)
         if data_obj:
             self.data = data_obj
 
+        self.serializer = get_serializer(serializer)
+        self.backup_name = parent + "/backup/" + name
+
     def sync(self):
-        do_sync(self.data, self.location, self.backup_name)
+        """
+        Persist the object. In write-behind mode the object is only marked as
+        dirty and the flusher thread will write it later.
+        """
+        if self.write_behind:
+            mark_dirty(self)
+        else:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the object to disk now
+        """
+        with dirty_lock:
+            dirty_objs.pop(id(self), None)
+
+        self.last_flush = time.monotonic()
+        try:
+            do_sync(self.data, self.location,
+                    self.backup_name, self.serializer)
+        except RuntimeError:
+            # The object was changed by another thread while being serialized
+            if not self.write_behind:
+                raise
+
+            logger.debug("Changed while syncing %s, retrying later" %
+                         self.location)
+            mark_dirty(self)
+
+    def load_file(self, location):
+        with open(location, "rb") as file:
+            return self.serializer.loads(file.read())
 
     def get_obj(self, location):
         try:
             if os.path.isfile(location):
                 logger.info("Load file %s linux" % location)
-                data = json.load(open(location, "r"))
+                data = self.load_file(location)
                 return data
             elif os.path.isfile(self.backup_name):
                 logger.error("Trying backup %s" % (self.backup_name))
                 # Try the backup
-                data = json.load(open(self.backup_name, "r"))
+                data = self.load_file(self.backup_name)
                 logger.critical("Loaded backup for " + self.location)
                 return data
         except:
@@ -63,7 +610,7 @@ class dstype():
                 if os.path.isfile(self.backup_name):
                     logger.error("Trying backup %s" % (self.backup_name))
                     # Try the backup
-                    data = json.load(open(self.backup_name, "r"))
+                    data = self.load_file(self.backup_name)
                     logger.critical("Loaded backup for " + self.location)
                     return data
             except:
@@ -93,29 +640,215 @@ class dsobj():
             self._data[name] = value
 
 
-class dsdict(dstype, collections.UserDict):
-    def __init__(self, parent, name):
+class dsdict(dstype, dstracked, collections.UserDict):
+    def __init__(self, parent, name, write_behind=None, serializer=None):
         collections.UserDict.__init__(self)
-        dstype.__init__(self, parent, name)
+        dstype.__init__(self, parent, name, write_behind, serializer)
+        self.track_data()
 
     def __getitem__(self, key):
         return collections.UserDict.__getitem__(self, key)
 
     def __setitem__(self, key, value):
-        collections.UserDict.__setitem__(self, key, value)
-        self.sync()
+        collections.UserDict.__setitem__(self, key, track(value, self, (key,)))
+        self.changed((key,))
         return self.data
 
+    def __delitem__(self, key):
+        collections.UserDict.__delitem__(self, key)
+        self.changed((key,))
+
+    def persist_keys(self, keys):
+        # The whole file is written anyway
+        self.sync()
+
+
+class dsjournal(dsdict):
+    """
+    Dictionary that appends each change to a journal file instead of
+    rewriting the whole file. The journal is periodically compacted into
+    the JSON file by the flusher thread.
+    """
+
+    def __init__(self, parent, name, write_behind=None, serializer=None):
+        self.journal_lock = threading.RLock()
+        self.journal_file = None
+        self.journal_records = 0
+
+        dsdict.__init__(self, parent, name, write_behind, serializer)
+
+        # Digest of the last persisted value of each key
+        self.persisted = {}
+        for key, value in self.data.items():
+            self.persisted[key] = digest(json.dumps(value, sort_keys=True))
+
+        # Keys waiting for the flusher in write-behind mode
+        self.pending_keys = set()
+
+    def persist_keys(self, keys):
+        if self.write_behind:
+            with self.journal_lock:
+                self.pending_keys.update(keys)
+            mark_dirty(self)
+        else:
+            self.write_records(keys)
+
+    def get_obj(self, location):
+        """
+        Load the last snapshot and replay the journal over it
+        """
+        self.journal_name = os.path.splitext(location)[0] + ".journal"
+
+        data = dstype.get_obj(self, location) or {}
+
+        # If a compaction was interrupted, the old journal is still there
+        for name in [self.journal_name + ".old", self.journal_name]:
+            if not os.path.isfile(name):
+                continue
+
+            logger.info("Replay journal %s" % name)
+            with open(name, "r") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Partially written record
+                        logger.error("Invalid record in %s" % name)
+                        continue
+
+                    self.journal_records += 1
+                    if record[0] == "s":
+                        data[record[1]] = record[2]
+                    elif record[0] == "d":
+                        data.pop(record[1], None)
+
+        return data
+
+    def write_records(self, keys):
+        """
+        Append records for the given keys if their value has changed
+        """
+        with self.journal_lock:
+            records = []
+            for key in keys:
+                if key not in self.data:
+                    if self.persisted.pop(key, None) is not None:
+                        records.append(json.dumps(["d", key]))
+                    continue
+
+                value = json.dumps(self.data[key], sort_keys=True)
+                value_digest = digest(value)
+                if self.persisted.get(key) == value_digest:
+                    continue
+
+                self.persisted[key] = value_digest
+                records.append('["s", %s, %s]' % (json.dumps(key), value))
+
+            if not records:
+                return
+
+            if not self.journal_file:
+                self.journal_file = open(self.journal_name, "a")
+
+            self.journal_file.write("\n".join(records) + "\n")
+            self.journal_file.flush()
+            self.journal_records += len(records)
+
+            if self.journal_records >= JOURNAL_COMPACT_RECORDS:
+                # Let the flusher thread write a new snapshot
+                mark_dirty(self)
+
+    def sync(self):
+        """
+        Append records for values that were changed in place
+        """
+        self.persist_keys(dict.fromkeys(
+            set(self.data.keys()) | set(self.persisted.keys())))
+
+    def flush(self):
+        """
+        Write pending records and compact the journal if it's too large
+        """
+        with dirty_lock:
+            dirty_objs.pop(id(self), None)
+
+        self.last_flush = time.monotonic()
+        with self.journal_lock:
+            keys = self.pending_keys
+            self.pending_keys = set()
 
-def do_sync(obj, name, backup_name):
-    @lockutils.synchronized(name)
-    def do_blocking_sync(obj, name, backup_name):
+        try:
+            self.write_records(keys)
+        except RuntimeError:
+            # The object was changed by another thread while being serialized
+            with self.journal_lock:
+                self.pending_keys.update(keys)
+            mark_dirty(self)
+            return
+
+        if self.journal_records >= JOURNAL_COMPACT_RECORDS:
+            self.compact()
+
+    def compact(self):
+        """
+        Compact the journal into a new snapshot
+        """
+        with self.journal_lock:
+            try:
+                out = self.serializer.dumps(self.data)
+            except RuntimeError:
+                # The object was changed by another thread while being serialized
+                mark_dirty(self)
+                return
+
+            # Start a new journal for changes made after the snapshot
+            if self.journal_file:
+                self.journal_file.close()
+                self.journal_file = None
+
+            if os.path.isfile(self.journal_name):
+                os.replace(self.journal_name, self.journal_name + ".old")
+            self.journal_records = 0
+
+        with path_locks.get(self.location):
+            write_atomic(self.location, out)
+
+        if os.path.isfile(self.journal_name + ".old"):
+            os.remove(self.journal_name + ".old")
+
+
+def digest(value):
+    """
+    Returns a short digest of a serialized value
+    """
+    return hashlib.blake2b(value.encode(), digest_size=16).digest()
+
+
+def write_atomic(name, out):
+    """
+    Write to a temporary file and rename it over the old one, so that
+    a crash never leaves a partially written file behind
+    """
+    tmp_name = name + ".tmp"
+    with open(tmp_name, "wb") as file:
+        file.write(out)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_name, name)
+
+
+def do_sync(obj, name, backup_name, serializer=None):
+    if not serializer:
+        serializer = SERIALIZERS["pretty"]
+
+    with path_locks.get(name):
         try:
             if os.path.isfile(name):
                 logger.debug("Do sync on " + name)
 
                 # Check if the current file is valid
-                json.load(open(name, "r"))
+                with open(name, "rb") as file:
+                    serializer.loads(file.read())
 
                 # If yes, do a backup
                 shutil.copy(name, backup_name)
@@ -131,14 +864,145 @@ def do_sync(obj, name, backup_name):
 
         logger.debug("Open file")
 
-        out = json.dumps(obj, indent=4, sort_keys=True)
-        file = open(name, "w")
-        file.write(out)
-        file.close()
+        out = serializer.dumps(obj)
+        write_atomic(name, out)
 
         logger.debug("Sync finished")
 
-    do_blocking_sync(obj, name, backup_name)
+
+def mark_dirty(obj):
+    """
+    Queue an object to be written by the flusher thread
+    """
+    with dirty_lock:
+        dirty_objs[id(obj)] = obj
+
+    start_flusher()
+
+
+def flush_all(only_due=False):
+    """
+    Write all objects that have pending changes
+    :param only_due: skip objects that were written less than their
+        write-behind interval ago
+    """
+    tnow = time.monotonic()
+    with dirty_lock:
+        to_flush = list(dirty_objs.values())
+
+    for obj in to_flush:
+        if only_due and tnow - obj.last_flush < (obj.write_behind or 0):
+            continue
+
+        try:
+            obj.flush()
+        except Exception:
+            logger.exception("Could not flush " + obj.location)
+
+
+@contextlib.contextmanager
+def deferred_writes():
+    """
+    Hold back the writes of tracked storage objects changed by the current
+    thread until the block ends, then persist each object once
+    """
+    depth = getattr(deferred, "depth", 0)
+    if depth == 0:
+        deferred.objs = {}
+    deferred.depth = depth + 1
+
+    try:
+        yield
+    finally:
+        deferred.depth -= 1
+        if deferred.depth == 0:
+            objs = deferred.objs
+            deferred.objs = {}
+
+            for obj, changes in objs.values():
+                try:
+                    obj.persist_keys(changes)
+                except Exception:
+                    logger.exception("Could not persist " + obj.location)
+
+
+def flusher():
+    """
+    Periodically write dirty objects to disk
+    """
+    while not flusher_stop.wait(FLUSHER_PERIOD):
+        flush_all(only_due=True)
+
+
+def start_flusher():
+    """
+    Start the flusher thread if it's not running
+    """
+    global flusher_thread
+
+    with dirty_lock:
+        if flusher_thread and flusher_thread.is_alive():
+            return
+
+        flusher_stop.clear()
+        flusher_thread = threading.Thread(
+            target=flusher,
+            name="storage_flusher",
+            daemon=True)
+        flusher_thread.start()
+
+
+def shutdown_storage():
+    """
+    Stop the flusher thread and write everything that is pending
+    """
+    flusher_stop.set()
+    if flusher_thread and flusher_thread is not threading.current_thread():
+        flusher_thread.join()
+
+    flush_all()
+
+
+atexit.register(shutdown_storage)
+
+
+def set_write_behind(interval):
+    """
+    Set the default write-behind interval for new storage objects
+    """
+    global WRITE_BEHIND_INTERVAL
+    WRITE_BEHIND_INTERVAL = interval
+
+
+def set_storage_backend(backend):
+    """
+    Set the backend used for new storage objects
+    """
+    global STORAGE_BACKEND
+
+    if backend not in ["json", "journal", "sqlite"]:
+        raise ValueError("Invalid storage backend %s" % backend)
+
+    STORAGE_BACKEND = backend
+
+
+def set_storage_serializer(name):
+    """
+    Set the default serializer for new storage objects
+    """
+    global STORAGE_SERIALIZER
+
+    # Fail early on unknown names
+    get_serializer(name)
+    STORAGE_SERIALIZER = name
+
+
+def set_lazy_cache_size(size):
+    """
+    Set how many decoded values lazily loaded dictionaries keep in memory
+    """
+    global LAZY_CACHE_SIZE
+    LAZY_CACHE_SIZE = size
 
 
 def set_storage_loc(location):
@@ -158,3 +1022,7 @@ def clean_storage_loc(location):
 def flush_storage():
     global dsdict_cache
     dsdict_cache = {}
+
+    # Drop pending changes of the discarded objects
+    with dirty_lock:
+        dirty_objs.clear()
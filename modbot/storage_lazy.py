@@ -0,0 +1,391 @@
+import os
+import json
+import mmap
+import threading
+import time
+import collections
+import collections.abc
+import modbot.storage as storage
+from modbot.storage import logger
+
+# Rewrite the data file when it holds more stale bytes than this, and more
+# stale bytes than live ones
+COMPACT_MIN_BYTES = 1024 * 1024
+
+# Rewrite the index when its log has more entries than this, and more
+# entries than the index has keys
+INDEX_LOG_MIN_ENTRIES = 1000
+
+
+class dslazy(storage.dstracked, collections.abc.MutableMapping):
+    """
+    Read-optimized dictionary. Values are stored one after the other in a
+    data file that is memory mapped, and an index file maps each key to the
+    position of its value. Values are only decoded when accessed and the
+    last cache_size decoded values are kept in memory.
+
+    Changed values are appended to the data file, so an older index always
+    points to valid data. New positions are appended to an index log, which
+    is merged into the index once it grows larger than the index itself.
+
+    Values that are changed stay in memory until they are written. If a
+    caller changes a value that was dropped from memory in the meantime,
+    the value is taken back from the change notification.
+    """
+
+    def __init__(self, parent, name, write_behind=None, cache_size=None):
+        if name.endswith(".json"):
+            name = name[:-len(".json")]
+
+        self.parent = parent
+        self.name = name
+        self.location = "%s%s/%s" % (storage.DS_LOC, parent, name)
+        self.index_name = self.location + ".idx"
+        self.index_log_name = self.index_name + ".log"
+        os.makedirs(os.path.dirname(self.location), exist_ok=True)
+
+        if write_behind is None:
+            write_behind = storage.WRITE_BEHIND_INTERVAL
+        self.write_behind = write_behind
+        self.last_flush = time.monotonic()
+
+        if cache_size is None:
+            cache_size = storage.LAZY_CACHE_SIZE
+        self.cache_size = cache_size
+
+        self.lock = threading.RLock()
+
+        # Decoded values, the most recently used ones last
+        self.cache = collections.OrderedDict()
+
+        # Keys waiting to be written. Their values are not evicted.
+        self.pending_keys = set()
+
+        # Maps keys that were evicted to the id of the value that was handed
+        # out, to recognize it if it's changed later
+        self.evicted = {}
+
+        # Position and length of each value in the data file; None for
+        # values that were not written yet
+        self.index = {}
+        self.data_file = None
+        self.data_map = None
+        self.index_log = None
+        self.log_entries = 0
+        self.data_size = 0
+        self.live_size = 0
+        self.generation = 0
+
+        self.init_tracking()
+
+        if os.path.isfile(self.index_name):
+            self.load_index()
+        else:
+            self.import_json()
+
+    def data_name(self, generation):
+        return "%s.%d.dat" % (self.location, generation)
+
+    def load_index(self):
+        with open(self.index_name, "r") as file:
+            index = json.load(file)
+
+        self.generation = index["generation"]
+        self.index = {key: tuple(pos) for key, pos in index["keys"].items()}
+        self.replay_index_log()
+        self.live_size = sum(pos[1] for pos in self.index.values())
+        self.open_data()
+
+        logger.info("Loaded index %s with %d keys" %
+                    (self.index_name, len(self.index)))
+
+    def replay_index_log(self):
+        """
+        Apply the positions written since the index was last rewritten
+        """
+        if not os.path.isfile(self.index_log_name):
+            return
+
+        with open(self.index_log_name, "r") as file:
+            for line in file:
+                try:
+                    generation, key, pos = json.loads(line)
+                except ValueError:
+                    # Partly written last line
+                    break
+
+                # Entries of an older data file were merged by compact()
+                if generation != self.generation:
+                    continue
+
+                if pos is None:
+                    self.index.pop(key, None)
+                else:
+                    self.index[key] = tuple(pos)
+                self.log_entries += 1
+
+    def import_json(self):
+        """
+        Start from an existing JSON storage file, if there is one
+        """
+        self.open_data()
+        self.write_index()
+
+        backup_name = "%s%s/backup/%s.json" % (
+            storage.DS_LOC, self.parent, self.name)
+        if not os.path.isfile(self.location + ".json") and \
+                not os.path.isfile(backup_name):
+            return
+
+        logger.info("Importing %s.json" % self.location)
+
+        # Use the regular loader so that backups are tried as well
+        data = storage.dsdict(self.parent, self.name, write_behind=0,
+                              serializer="pretty").data
+        for key, value in data.items():
+            self.index[key] = None
+            self.cache[key] = value
+
+        self.write_keys(list(data.keys()))
+        self.evict()
+
+    def open_data(self):
+        """
+        Open the data file of the current generation for appending
+        """
+        if self.data_file:
+            self.data_file.close()
+
+        self.data_file = open(self.data_name(self.generation), "ab")
+        self.data_size = self.data_file.tell()
+        self.map_data()
+
+    def map_data(self):
+        if self.data_map:
+            self.data_map.close()
+            self.data_map = None
+
+        # Empty files can't be mapped
+        if self.data_size:
+            with open(self.data_name(self.generation), "rb") as file:
+                self.data_map = mmap.mmap(
+                    file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read_value(self, key):
+        offset, length = self.index[key]
+        if not self.data_map or offset + length > len(self.data_map):
+            self.map_data()
+
+        return json.loads(self.data_map[offset:offset + length])
+
+    def evict(self):
+        """
+        Drop the least recently used values that don't have pending writes
+        """
+        for key in list(self.cache.keys()):
+            if len(self.cache) <= self.cache_size:
+                break
+
+            if key not in self.pending_keys:
+                self.evicted[key] = id(self.cache.pop(key))
+
+    def changed(self, path, top=None, keys=None):
+        key = path[0]
+        with self.lock:
+            # A caller changed a value after it was evicted
+            if top is not None and key not in self.cache and \
+                    self.evicted.get(key) == id(top):
+                del self.evicted[key]
+                self.cache[key] = top
+
+            # Keep the value until it's written
+            self.pending_keys.add(key)
+
+        super().changed(path, top, keys)
+
+    def __getitem__(self, key):
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+
+            if key not in self.index:
+                raise KeyError(key)
+
+            value = storage.track(self.read_value(key), self, (key,))
+            self.cache[key] = value
+            self.evicted.pop(key, None)
+            self.evict()
+
+            return value
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            self.index.setdefault(key, None)
+            value = storage.track(value, self, (key,))
+            self.cache[key] = value
+            self.cache.move_to_end(key)
+            self.evicted.pop(key, None)
+
+        self.changed((key,), value)
+
+    def __delitem__(self, key):
+        with self.lock:
+            pos = self.index.pop(key)
+            self.cache.pop(key, None)
+            self.evicted.pop(key, None)
+            if pos:
+                self.live_size -= pos[1]
+
+        self.changed((key,))
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __iter__(self):
+        return iter(list(self.index.keys()))
+
+    def __len__(self):
+        return len(self.index)
+
+    def write_keys(self, keys):
+        """
+        Append the values of the given keys and write the new index
+        """
+        with self.lock:
+            changes = []
+            for key in keys:
+                self.pending_keys.discard(key)
+
+                if key not in self.index:
+                    # Deleted
+                    changes.append((key, None))
+                    continue
+
+                if key not in self.cache:
+                    continue
+
+                out = json.dumps(self.cache[key]).encode()
+
+                old_pos = self.index[key]
+                if old_pos:
+                    self.live_size -= old_pos[1]
+
+                self.index[key] = (self.data_size, len(out))
+                self.data_file.write(out)
+                self.data_size += len(out)
+                self.live_size += len(out)
+                changes.append((key, self.index[key]))
+
+            self.data_file.flush()
+            os.fsync(self.data_file.fileno())
+
+            if self.data_size - self.live_size > \
+                    max(self.live_size, COMPACT_MIN_BYTES):
+                self.compact()
+            elif self.log_entries + len(changes) > \
+                    max(len(self.index), INDEX_LOG_MIN_ENTRIES):
+                self.write_index()
+            elif changes:
+                self.append_index(changes)
+
+            self.evict()
+
+    def append_index(self, changes):
+        """
+        Add new positions to the index log
+        """
+        out = "".join(json.dumps([self.generation, key, pos]) + "\n"
+                      for key, pos in changes)
+
+        with storage.path_locks.get(self.index_name):
+            if not self.index_log:
+                self.index_log = open(self.index_log_name, "a")
+
+            self.index_log.write(out)
+            self.index_log.flush()
+            os.fsync(self.index_log.fileno())
+
+        self.log_entries += len(changes)
+
+    def write_index(self):
+        index = {
+            "generation": self.generation,
+            "keys": {key: pos for key, pos in self.index.items() if pos}}
+
+        with storage.path_locks.get(self.index_name):
+            storage.write_atomic(self.index_name, json.dumps(index).encode())
+
+            # The log is merged in the index
+            if self.index_log:
+                self.index_log.truncate(0)
+            elif os.path.isfile(self.index_log_name):
+                os.remove(self.index_log_name)
+
+        self.log_entries = 0
+
+    def compact(self):
+        """
+        Copy the live values to a new data file
+        """
+        with self.lock:
+            if not self.data_map or self.data_size > len(self.data_map):
+                self.map_data()
+
+            old_name = self.data_name(self.generation)
+            new_index = {}
+            with open(self.data_name(self.generation + 1), "wb") as file:
+                for key, pos in self.index.items():
+                    if not pos:
+                        continue
+
+                    offset, length = pos
+                    new_index[key] = (file.tell(), length)
+                    file.write(self.data_map[offset:offset + length])
+
+                file.flush()
+                os.fsync(file.fileno())
+
+            logger.info("Compacted %s from %d to %d bytes" %
+                        (self.location, self.data_size, self.live_size))
+
+            self.generation += 1
+            self.index.update(new_index)
+            self.open_data()
+            self.write_index()
+
+            # Only remove the old data once the new index is in place
+            os.remove(old_name)
+
+    def persist_keys(self, keys):
+        if self.write_behind:
+            with self.lock:
+                self.pending_keys.update(keys)
+            storage.mark_dirty(self)
+        else:
+            self.write_keys(keys)
+
+    def sync(self):
+        """
+        Persist values that were changed in place
+        """
+        self.persist_keys(dict.fromkeys(self.cache.keys()))
+
+    def flush(self):
+        """
+        Write pending changes now
+        """
+        with storage.dirty_lock:
+            storage.dirty_objs.pop(id(self), None)
+
+        self.last_flush = time.monotonic()
+        with self.lock:
+            keys = self.pending_keys
+            self.pending_keys = set()
+
+            try:
+                self.write_keys(keys)
+            except RuntimeError:
+                # The object was changed by another thread while being serialized
+                self.pending_keys.update(keys)
+                storage.mark_dirty(self)
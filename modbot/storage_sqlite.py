@@ -0,0 +1,372 @@
+import os
+import json
+import glob
+import sqlite3
+import threading
+import time
+import collections
+import modbot.storage as storage
+from modbot.storage import logger, digest
+
+DB_NAME = "storage.db"
+
+# Subkey of the row that holds a top level value. Dictionaries are stored as
+# an empty dictionary in this row and one more row for each of their items.
+WHOLE_VALUE = ""
+
+KV_TABLE = ("CREATE TABLE IF NOT EXISTS kv ("
+            "parent TEXT, name TEXT, key TEXT, subkey TEXT, value TEXT, "
+            "PRIMARY KEY (parent, name, key, subkey))")
+
+INSERT_ROW = ("INSERT OR REPLACE INTO kv (parent, name, key, subkey, value) "
+              "VALUES (?, ?, ?, ?, ?)")
+DELETE_ROW = "DELETE FROM kv WHERE parent=? AND name=? AND key=? AND subkey=?"
+DELETE_KEY = "DELETE FROM kv WHERE parent=? AND name=? AND key=?"
+
+# Open database connections, mapped by path
+connections = {}
+connections_lock = threading.Lock()
+
+
+class dbconn():
+    """
+    Wrapper over a sqlite connection that can be shared between threads
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None)
+
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(KV_TABLE)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS migrated ("
+            "parent TEXT, name TEXT, PRIMARY KEY (parent, name))")
+
+        # Databases written before dictionaries were split into rows
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(kv)")]
+        if "subkey" not in columns:
+            self.conn.executescript(
+                "BEGIN;"
+                "ALTER TABLE kv RENAME TO kv_old;"
+                + KV_TABLE + ";"
+                "INSERT INTO kv SELECT parent, name, key, '', value FROM kv_old;"
+                "DROP TABLE kv_old;"
+                "COMMIT;")
+
+    def execute(self, query, args=()):
+        with self.lock:
+            return self.conn.execute(query, args).fetchall()
+
+    def executemany(self, query, args):
+        self.executebatch([(query, args)])
+
+    def executebatch(self, batch):
+        """
+        Run a list of (query, list of args) in one transaction
+        """
+        with self.lock:
+            self.conn.execute("BEGIN")
+            try:
+                for query, args in batch:
+                    self.conn.executemany(query, args)
+                self.conn.execute("COMMIT")
+            except:
+                self.conn.execute("ROLLBACK")
+                raise
+
+
+def get_conn(location=None):
+    """
+    Get the database connection for a storage location
+    """
+    if not location:
+        location = storage.DS_LOC
+
+    path = os.path.join(location, DB_NAME)
+    with connections_lock:
+        if path not in connections:
+            os.makedirs(location, exist_ok=True)
+            connections[path] = dbconn(path)
+
+        return connections[path]
+
+
+def close_all():
+    """
+    Close all open connections
+    """
+    with connections_lock:
+        for conn in connections.values():
+            conn.conn.close()
+        connections.clear()
+
+
+def encode_subkey(key):
+    """
+    Subkey of the row of a dictionary item. Items always get a JSON string,
+    so they never use the WHOLE_VALUE subkey.
+    """
+    return json.dumps(str(key))
+
+
+def value_rows(parent, name, key, value):
+    """
+    Rows that store a top level value, one for each item of dictionaries
+    """
+    if not isinstance(value, dict):
+        return [(parent, name, str(key), WHOLE_VALUE,
+                 json.dumps(value, sort_keys=True))]
+
+    rows = [(parent, name, str(key), WHOLE_VALUE, "{}")]
+    for child, item in value.items():
+        rows.append((parent, name, str(key), encode_subkey(child),
+                     json.dumps(item, sort_keys=True)))
+
+    return rows
+
+
+class sqlitedict(storage.dstracked, collections.UserDict):
+    """
+    Dictionary that stores each key as a row in a sqlite database. Top level
+    dictionaries get one row per item, so changing an item only writes
+    its row.
+    """
+
+    def __init__(self, parent, name, write_behind=None):
+        collections.UserDict.__init__(self)
+
+        if name.endswith(".json"):
+            name = name[:-len(".json")]
+
+        self.parent = parent
+        self.name = name
+        self.location = "%s%s/%s" % (storage.DS_LOC, parent, name)
+        self.conn = get_conn()
+
+        if write_behind is None:
+            write_behind = storage.WRITE_BEHIND_INTERVAL
+        self.write_behind = write_behind
+        self.last_flush = time.monotonic()
+
+        # Digest of the last persisted value of each key, or for values that
+        # are split into rows, a dictionary of the digests of each item
+        self.persisted = {}
+
+        # Changes waiting for the flusher in write-behind mode
+        self.pending_changes = {}
+        self.pending_lock = threading.RLock()
+
+        import_json(self.conn, parent, name)
+
+        items = collections.defaultdict(dict)
+        for key, subkey, value in self.conn.execute(
+                "SELECT key, subkey, value FROM kv WHERE parent=? AND name=? "
+                "ORDER BY rowid", (parent, name)):
+            if subkey != WHOLE_VALUE:
+                items[key][subkey] = value
+                continue
+
+            self.data[key] = json.loads(value)
+            if value == "{}":
+                self.persisted[key] = {}
+            else:
+                self.persisted[key] = digest(value)
+
+        for key, values in items.items():
+            if not isinstance(self.persisted.get(key), dict):
+                logger.error("Dropping items of %s in %s" % (key, self.location))
+                continue
+
+            for subkey, value in values.items():
+                self.data[key][json.loads(subkey)] = json.loads(value)
+                self.persisted[key][subkey] = digest(value)
+
+        self.track_data()
+
+    def __setitem__(self, key, value):
+        collections.UserDict.__setitem__(
+            self, key, storage.track(value, self, (key,)))
+        self.changed((key,))
+
+    def __delitem__(self, key):
+        collections.UserDict.__delitem__(self, key)
+        self.changed((key,))
+
+    def write_keys(self, changes):
+        """
+        Write the rows of the given changes whose value has changed and delete
+        the rows of values that were removed
+        """
+        with self.pending_lock:
+            try:
+                batch = self.changed_rows(changes)
+                if batch:
+                    self.conn.executebatch(batch)
+            except:
+                # Rewrite these keys in full next time
+                for key in changes:
+                    self.persisted[key] = ""
+                raise
+
+    def changed_rows(self, changes):
+        """
+        Get the queries that write the given changes
+        """
+        rows = []
+        deleted_rows = []
+        deleted_keys = []
+        for key, children in changes.items():
+            old = self.persisted.get(key)
+
+            if key not in self.data:
+                if self.persisted.pop(key, None) is not None:
+                    deleted_keys.append((self.parent, self.name, str(key)))
+                continue
+
+            value = self.data[key]
+            if not isinstance(value, dict):
+                dumped = json.dumps(value, sort_keys=True)
+                value_digest = digest(dumped)
+                if old == value_digest:
+                    continue
+
+                # Drop the items if it was a dictionary
+                if isinstance(old, dict):
+                    deleted_keys.append((self.parent, self.name, str(key)))
+                self.persisted[key] = value_digest
+                rows.append((self.parent, self.name, str(key), WHOLE_VALUE, dumped))
+                continue
+
+            if not isinstance(old, dict):
+                # Split the value into rows
+                if old is not None:
+                    deleted_keys.append((self.parent, self.name, str(key)))
+                rows.append((self.parent, self.name, str(key), WHOLE_VALUE, "{}"))
+                old = self.persisted[key] = {}
+                children = None
+
+            if children is None:
+                # Check all items and drop the rows of removed ones
+                children = list(value.keys())
+                current = set(encode_subkey(child) for child in children)
+                for subkey in list(old.keys()):
+                    if subkey not in current:
+                        del old[subkey]
+                        deleted_rows.append(
+                            (self.parent, self.name, str(key), subkey))
+
+            for child in children:
+                subkey = encode_subkey(child)
+                if child not in value:
+                    if old.pop(subkey, None) is not None:
+                        deleted_rows.append(
+                            (self.parent, self.name, str(key), subkey))
+                    continue
+
+                dumped = json.dumps(value[child], sort_keys=True)
+                value_digest = digest(dumped)
+                if old.get(subkey) == value_digest:
+                    continue
+
+                old[subkey] = value_digest
+                rows.append((self.parent, self.name, str(key), subkey, dumped))
+
+        batch = []
+        if deleted_keys:
+            batch.append((DELETE_KEY, deleted_keys))
+        if rows:
+            batch.append((INSERT_ROW, rows))
+        if deleted_rows:
+            batch.append((DELETE_ROW, deleted_rows))
+
+        return batch
+
+    def persist_keys(self, changes):
+        if self.write_behind:
+            with self.pending_lock:
+                storage.merge_changes(self.pending_changes, changes)
+            storage.mark_dirty(self)
+        else:
+            self.write_keys(changes)
+
+    def sync(self):
+        """
+        Persist values that were changed in place
+        """
+        self.persist_keys(dict.fromkeys(
+            set(self.data.keys()) | set(self.persisted.keys())))
+
+    def flush(self):
+        """
+        Write pending changes now
+        """
+        with storage.dirty_lock:
+            storage.dirty_objs.pop(id(self), None)
+
+        self.last_flush = time.monotonic()
+        with self.pending_lock:
+            changes = self.pending_changes
+            self.pending_changes = {}
+
+        try:
+            self.write_keys(changes)
+        except RuntimeError:
+            # The object was changed by another thread while being serialized
+            with self.pending_lock:
+                storage.merge_changes(self.pending_changes, changes)
+            storage.mark_dirty(self)
+
+
+def import_json(conn, parent, name):
+    """
+    Import a JSON storage file into the database, if it was not imported yet
+    """
+    if conn.execute("SELECT 1 FROM migrated WHERE parent=? AND name=?",
+                    (parent, name)):
+        return
+
+    # Use the regular loader so that backups are tried as well. Stores that
+    # only have a backup left are imported from it.
+    data = {}
+    if os.path.isfile("%s%s/%s.json" % (storage.DS_LOC, parent, name)) or \
+            os.path.isfile("%s%s/backup/%s.json" % (storage.DS_LOC, parent, name)):
+        data = storage.dsdict(parent, name, write_behind=0,
+                              serializer="pretty").data
+
+        logger.info("Importing %s/%s into %s" % (parent, name, conn.path))
+
+    rows = []
+    for key, value in data.items():
+        rows.extend(value_rows(parent, name, key, value))
+    conn.executemany(INSERT_ROW, rows)
+    conn.execute("INSERT OR IGNORE INTO migrated (parent, name) VALUES (?, ?)",
+                 (parent, name))
+
+
+def migrate_from_json(location=None):
+    """
+    Import all JSON storage files from storage_data/<parent>/<name>.json
+    """
+    if location:
+        storage.set_storage_loc(location)
+
+    conn = get_conn()
+    for path in glob.glob(os.path.join(storage.DS_LOC, "**", "*.json"), recursive=True):
+        rel_path = os.path.relpath(path, storage.DS_LOC)
+        parent, name = os.path.split(rel_path)
+
+        # Backup copies belong to the store in the parent folder
+        if os.path.basename(parent) == "backup":
+            parent = os.path.dirname(parent)
+
+        import_json(conn, parent, name[:-len(".json")])
+
+
+if __name__ == "__main__":
+    import sys
+
+    migrate_from_json(sys.argv[1] if len(sys.argv) > 1 else None)
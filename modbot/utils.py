@@ -1,5 +1,6 @@
 import datetime
 import threading
+import concurrent.futures
 import configparser
 import tzcron
 import pytz
@@ -26,7 +27,24 @@ class BotThread():
         self.obj.start()
 
     def isAlive(self):
-        self.obj.is_alive()
+        return self.obj.is_alive()
+
+
+class BotThreadPool():
+    """
+    Wrapper over a fixed size thread pool
+    """
+
+    def __init__(self, max_workers, name=None):
+        self.obj = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=name)
+
+    def submit(self, target, *args):
+        return self.obj.submit(target, *args)
+
+    def shutdown(self, wait=True):
+        self.obj.shutdown(wait=wait)
 
 
 class timedata:
@@ -1,7 +1,7 @@
 import prawcore
 from modbot import utils
 from modbot.log import botlog
-from modbot.storage import dsdict
+from modbot.storage import get_stored_dict
 
 logger = botlog("wiki_page")
 EMPTY_WIKI = ""
@@ -56,7 +56,7 @@ class WatchedWiki():
         self.args = {}
 
         # Create location for small storage
-        self.storage = dsdict(self.subreddit_name, self.wiki_page)
+        self.storage = get_stored_dict(self.subreddit_name, self.wiki_page)
         self.args["storage"] = self.storage
 
         # Initialize wiki r/w
@@ -2,7 +2,7 @@ import argparse
 from modbot import hook
 from modbot.log import botlog
 from modbot.utils import parse_wiki_content, cron_next, utcnow, timestamp_string
-from modbot.reddit_wrapper import post_submission_text, get_submission, get_comment, get_subreddit, get_moderators_for_sub
+from modbot.reddit_wrapper import post_submission_text, get_submission, get_items, get_subreddit, get_moderators_for_sub
 
 plugin_documentation = r"""
 This plugin allows mods to schedule posts at regular intervals.
@@ -198,14 +198,14 @@ def post_submission(storage, subreddit, title, body, sticky):
 
     storage["posts"].append(new_elem)
 
-    return new_elem
+    # Return the stored element so that changes to it are saved
+    return storage["posts"][-1]
 
 
 def post_with_raw_body(storage, subreddit, title, body, sticky):
     posted = post_submission(storage, subreddit, title, body, sticky)
 
     posted["body"] = body
-    storage.sync()
     return posted
 
 
@@ -219,7 +219,6 @@ def post_with_wiki_body(storage, subreddit, title, wiki_name, sticky):
     posted = post_submission(storage, subreddit, title, body, sticky)
 
     posted["wikibody"] = wiki_name
-    storage.sync()
     return posted
 
 
@@ -230,7 +229,6 @@ def post_with_clone_body(storage, subreddit, title, clone_thread, sticky):
     posted = post_submission(storage, subreddit, title, sub.selftext, sticky)
 
     posted["clone_source"] = sub.shortlink
-    storage.sync()
     return posted
 
 
@@ -393,7 +391,6 @@ def integrate_comment(message, cmd_args, storage):
         message.author.send_pm("Commend ID already added",
                                "Already watching %s in %s" % (comm_id, sub.shortlink))
 
-    storage.sync()
     gather_body(sub, target)
 
 
@@ -450,7 +447,6 @@ def nointegrate_comment(message, cmd_args, storage):
         message.author.send_pm(
             "Commend ID not watched", "Not watching %s in %s" % (comm_id, sub.shortlink))
 
-    storage.sync()
     gather_body(sub, target)
 
 
@@ -490,7 +486,6 @@ def resticky(message, cmd_args, storage):
 
     elem["sticky"] = True
     sub.make_sticky()
-    storage.sync()
 
 
 @hook.periodic(period=60 * 2)
@@ -498,12 +493,19 @@ def check_contents(storage):
     if "posts" not in storage:
         return
 
-    for elem in storage["posts"]:
-        # Skip unsticked submissions
-        if elem["sticky"] == False:
+    # Skip unsticked submissions
+    stickies = [elem for elem in storage["posts"] if elem["sticky"] != False]
+    if not stickies:
+        return
+
+    # Refresh all stickies at once
+    items = get_items([elem["shortlink"] for elem in stickies], fresh=True)
+
+    for elem in stickies:
+        submission = items.get(elem["shortlink"])
+        if not submission:
             continue
 
-        submission = get_submission(elem["shortlink"])
         if submission.stickied:
             # If still sticky, update it
             gather_body(submission, elem)
@@ -511,9 +513,6 @@ def check_contents(storage):
             # If unsticked, mark as unsticky
             elem["sticky"] = False
 
-            # Sync changed elements
-            storage.sync()
-
 
 def gather_body(submission, stored):
     logger.debug("[%s] gathering body" % stored["shortlink"])
@@ -523,7 +522,7 @@ def gather_body(submission, stored):
     # Order is important!
     if stored["clone_source"]:
         # Post was cloned from another post
-        original_post = get_submission(stored["clone_source"])
+        original_post = get_submission(stored["clone_source"], fresh=True)
         all_body = original_post.selftext
         logger.debug("[%s] it's a clone" % stored["shortlink"])
     elif stored["wikibody"]:
@@ -537,8 +536,13 @@ def gather_body(submission, stored):
         all_body = stored["body"]
         logger.debug("[%s] it's a self text" % stored["shortlink"])
 
-    for comment_id in stored["integrated_comms"]:
-        comm = get_comment(comment_id)
+    comm_ids = ["t1_" + comment_id for comment_id in stored["integrated_comms"]]
+    comms = get_items(comm_ids, fresh=True)
+    for comment_id in comm_ids:
+        if comment_id not in comms:
+            continue
+
+        comm = comms[comment_id]
         all_body += "\n***\n"
         all_body += comm.body
         all_body += "\n\nContributor: /u/%s, [source](%s)" % (
@@ -303,19 +303,25 @@ def submission(subreddit, submission, storage):
         new["aflair_done"] = False
 
     storage["subs"][submission.shortlink] = new
-    storage.sync()
 
 
 def flair_updater(subreddit, storage, reddit):
     if subreddit.display_name not in wiki_config:
         return
 
+    posts = list(storage["subs"].values())
+    if not posts:
+        return {}
+
+    # Refresh all tracked posts at once
+    items = reddit.get_items([post["shortlink"] for post in posts], fresh=True)
+
     to_remove = []
-    for post in list(storage["subs"].values()):
-        post_sub = reddit.get_submission(url=post["shortlink"])
+    for post in posts:
+        post_sub = items.get(post["shortlink"])
 
         # Did the author remove it?
-        if post_sub.author == None:
+        if post_sub == None or post_sub.author == None:
             logger.debug("[%s] Remove because deleted by user" %
                          (post["shortlink"]))
             to_remove.append(post)
@@ -333,13 +339,14 @@ def flair_updater(subreddit, storage, reddit):
             to_remove.append(post)
 
     # Clean up threads that are to be removed
-    for post in to_remove:
-        try:
-            del storage["subs"][post["shortlink"]]
-        except:
-            pass
-    if len(to_remove) > 0:
-        storage.sync()
+    with storage.batch():
+        for post in to_remove:
+            try:
+                del storage["subs"][post["shortlink"]]
+            except:
+                pass
+
+    return items
 
 
 @hook.periodic(period=10, wiki=wiki)
@@ -352,7 +359,7 @@ def per(subreddit, storage, reddit):
         return
 
     # Update the flairs first
-    flair_updater(subreddit, storage, reddit)
+    items = flair_updater(subreddit, storage, reddit) or {}
 
     tnow = utcnow()
 
@@ -373,7 +380,6 @@ def per(subreddit, storage, reddit):
             # Has the user updated the flair?
             if post["link_flair_text"] in [None, ""]:
                 post["notif_level"] += 1
-                storage.sync()
 
                 if post["notif_level"] > post["max_level"]:
                     raise ValueError()
@@ -393,15 +399,16 @@ def per(subreddit, storage, reddit):
                 for k, v in args.items():
                     msg = msg.replace("${%s}" % k, str(v))
 
-                crt_sub = reddit.get_submission(url=post["shortlink"])
+                crt_sub = items.get(post["shortlink"]) or \
+                    reddit.get_submission(url=post["shortlink"], fresh=True)
                 crt_sub.author.send_pm("Please flair your post", msg)
                 logger.info("Sent message %d for %s" %
                             (post["notif_level"], post["shortlink"]))
 
         if post["has_aflair"] and not post["aflair_done"] and tnow - post["aflair_time"] > 0:
             post["aflair_done"] = True
-            storage.sync()
-            crt_sub = reddit.get_submission(url=post["shortlink"])
+            crt_sub = items.get(post["shortlink"]) or \
+                reddit.get_submission(url=post["shortlink"], fresh=True)
 
             logger.info("Trying autoflair for %s" % post["shortlink"])
             proposed_flair = None
@@ -429,11 +436,10 @@ def per(subreddit, storage, reddit):
                 continue
 
     # Clean up threads that are to be removed
-    for post in to_remove:
-        try:
-            if post["shortlink"] in storage["subs"]:
-                del storage["subs"][post["shortlink"]]
-        except:
-            pass
-    if len(to_remove) > 0:
-        storage.sync()
+    with storage.batch():
+        for post in to_remove:
+            try:
+                if post["shortlink"] in storage["subs"]:
+                    del storage["subs"][post["shortlink"]]
+            except:
+                pass
@@ -76,7 +76,12 @@ def check_words(text, config, author):
     return found_words
 
 
-@hook.submission()
+def has_config():
+    # Items from /r/all are only needed if a subreddit set up a word list
+    return len(wiki_config) > 0
+
+
+@hook.submission(active=has_config)
 def new_post(submission, reddit):
     # Skip link posts
     if not submission.is_self:
@@ -92,7 +97,7 @@ def new_post(submission, reddit):
                 "Given word/words has/have been found in a submission", message_body)
 
 
-@hook.comment()
+@hook.comment(active=has_config)
 def new_comment(comment, reddit):
     # Skip self posts
     for subreddit_name, config in wiki_config.items():
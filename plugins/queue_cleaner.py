@@ -1,7 +1,8 @@
 import datetime
+import threading
 
 from modbot import hook
-from modbot.reddit_wrapper import scrape_modqueue, submission, comment, get_user
+from modbot.reddit_wrapper import get_modqueue, submission, comment, get_user
 from modbot.log import botlog, send_to_discord
 from modbot.utils import parse_wiki_content, remove_quotes, get_utcnow
 
@@ -90,6 +91,16 @@ logger = botlog("queue_cleaner_plugin")
 # Store wiki configuration per subreddit
 wiki_config = {}
 
+# New or changed modqueue items of each subreddit, since the last check
+changed_items = {}
+
+# Subreddits where the whole queue needs to be checked
+check_all = set()
+
+# Guards changed_items and check_all, which are filled by the modqueue and
+# wiki hooks while the periodic check takes them
+changed_lock = threading.Lock()
+
 
 class QueueCleaner():
     """
@@ -133,6 +144,9 @@ class QueueCleaner():
     class QueueCleanerBase():
         required_fields = []
 
+        # Set if the whole queue is needed, not just the items that changed
+        full_queue = False
+
         def __init__(self, data):
             # Validate the section
             for field in self.required_fields:
@@ -310,6 +324,8 @@ class QueueCleaner():
             ))
 
     class QueueCleanerUserNotification(QueueCleanerItemNotification):
+        full_queue = True
+
         def begin_ingest(self):
             """
             Begin a new ingestion pass
@@ -392,6 +408,15 @@ class QueueCleaner():
         for config in self._configs.values():
             config.ingest(item)
 
+    def ingest_queue(self, changed, queue):
+        """
+        Ingest the changed items, or the whole queue for configurations
+        that need it
+        """
+        for config in self._configs.values():
+            for item in queue if config.full_queue else changed:
+                config.ingest(item)
+
     def end_ingest(self):
         """
         End the current ingestion pass and process all actions
@@ -461,8 +486,10 @@ def wiki_changed(sub, change):
         change.author.send_pm(
             "Error parsing the updated wiki page on %s" % sub, str(e))
 
-    # Save the config
+    # Save the config and check the whole queue again
     wiki_config[sub.display_name] = config
+    with changed_lock:
+        check_all.add(sub.display_name)
     logger.debug("Added config to wiki_config. Current list: %s" %
                  str(wiki_config.keys()))
 
@@ -473,16 +500,38 @@ wiki = hook.register_wiki_page(
     documentation=plugin_documentation,
     wiki_change_notifier=wiki_changed)
 
+@hook.modqueue(wiki=wiki, changed_only=True)
+def on_modqueue(modqueue, subreddit_name):
+    """
+    Keep the new or changed items until the next check
+    """
+    with changed_lock:
+        changed_items.setdefault(subreddit_name, {})[
+            modqueue.target_fullname] = modqueue
+
+
 def do_scrape_modqueue(config, subreddit_name):
     """
-    Scrape the modqueue for a subreddit
+    Check the modqueue items of a subreddit that changed since the last
+    check
     """
+    queue = get_modqueue(subreddit_name)
+    with changed_lock:
+        pending = changed_items.pop(subreddit_name, {})
+        full_check = subreddit_name in check_all
+        check_all.discard(subreddit_name)
+
+    if full_check:
+        changed = queue
+    else:
+        # Skip items that left the queue in the meantime
+        in_queue = set(item.target_fullname for item in queue)
+        changed = [item for fullname, item in pending.items()
+                   if fullname in in_queue]
+
     # Start the scraper
     config.begin_ingest()
-
-    for item in scrape_modqueue(subreddit_name):
-        # Ingest the item
-        config.ingest(item)
+    config.ingest_queue(changed, queue)
 
     # End the scraper
     config.end_ingest()
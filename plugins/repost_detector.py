@@ -93,6 +93,7 @@ wiki = hook.register_wiki_page(
 def new_post(submission, storage, reddit, subreddit):
     if "subs" not in storage:
         storage["subs"] = {}
+    subs = storage.expiring(MAX_AGE, lambda post: post["created_utc"], "subs")
 
     # Get wiki configuration
     if subreddit.display_name not in wiki_config:
@@ -111,13 +112,16 @@ def new_post(submission, storage, reddit, subreddit):
     # Get current time
     tnow = utcnow()
 
+    # Eliminate old submissions
+    subs.expire(tnow)
+
     # Don't take action on old posts
     if tnow - submission.created_utc > MAX_ACTION_TIME:
         logger.debug("[%s] Skipped because it's too old" %
                      (submission.shortlink))
         return
 
-    if submission.shortlink in storage["subs"]:
+    if submission.shortlink in subs:
         logger.debug("[%s] Submission already added" % (submission.shortlink))
         return
 
@@ -129,7 +133,8 @@ def new_post(submission, storage, reddit, subreddit):
         return
 
     # Check against old titles
-    for post in storage["subs"].values():
+    candidates = []
+    for post in subs.values():
         # Calculate two-way overlap factor
         logger.debug("[%s] Checking\n\t%s\n\t%s" %
                      (submission.shortlink, cleaned_title, post["filtered"]))
@@ -139,19 +144,28 @@ def new_post(submission, storage, reddit, subreddit):
         logger.debug("[%s] Calculated repost factor %f" %
                      (submission.shortlink, overlap_factor))
         if overlap_factor > config.min_overlap_percent:
-            post_sub = reddit.get_submission(url=post["shortlink"])
-            # Did the author remove it?
-            if post_sub.author == None:
-                continue
-            # Was it removed?
-            elif post_sub.is_crosspostable == False:
-                continue
-
-            logger.debug("[%s] Reporting as dupe for %s / factor %f" %
-                         (submission.shortlink, post["shortlink"], overlap_factor))
-            submission.report("Possible repost of %s, with a factor of %.2f%%" % (
-                post["shortlink"], overlap_factor))
-            return
+            candidates.append((post, overlap_factor))
+
+    # Refresh all candidates at once, bypassing the cache so that removals
+    # and deletions are seen
+    if candidates:
+        items = reddit.get_items(
+            [post["shortlink"] for post, _ in candidates], fresh=True)
+
+    for post, overlap_factor in candidates:
+        post_sub = items.get(post["shortlink"])
+        # Did the author remove it?
+        if post_sub == None or post_sub.author == None:
+            continue
+        # Was it removed?
+        elif post_sub.is_crosspostable == False:
+            continue
+
+        logger.debug("[%s] Reporting as dupe for %s / factor %f" %
+                     (submission.shortlink, post["shortlink"], overlap_factor))
+        submission.report("Possible repost of %s, with a factor of %.2f%%" % (
+            post["shortlink"], overlap_factor))
+        return
 
     # Add new element
     new = {}
@@ -160,10 +174,4 @@ def new_post(submission, storage, reddit, subreddit):
     new["shortlink"] = submission.shortlink
     new["created_utc"] = submission.created_utc
 
-    # Eliminate old submissions
-    for post in list(storage["subs"].values()):
-        if tnow - post["created_utc"] > MAX_AGE:
-            del storage["subs"][post["shortlink"]]
-
-    storage["subs"][submission.shortlink] = new
-    storage.sync()
+    subs[submission.shortlink] = new
@@ -3,6 +3,10 @@ import os
 import time
 from datetime import timedelta
 from modbot import hook
+from modbot.executor import get_executor_stats
+from modbot.reddit_wrapper import get_feeder_stats, get_cache_stats
+
+FEEDER_NAMES = {"t3_": "Submissions", "t1_": "Comments"}
 
 
 @hook.command(permission=hook.permission.OWNER)
@@ -18,16 +22,43 @@ def system_status(message):
     memory_usage = process.memory_info()[0] / (1024 * 1024)
     uptime = timedelta(seconds=round(time.time() - process.create_time()))
 
+    plugin_stats = get_executor_stats().values()
+    tasks_running = sum(stats["running"] for stats in plugin_stats)
+    tasks_queued = sum(stats["queued"] for stats in plugin_stats)
+
+    cache_stats = get_cache_stats()
+
     reply = \
         """
     Uptime: %s
     Threads: %s
     CPU Usage: %s
-    Memory Usage (MB): %s""" % (
+    Memory Usage (MB): %s
+    Plugin tasks running/queued: %s/%s
+    Item cache hits/misses/size: %s/%s/%s""" % (
             uptime,
             thread_count,
             cpu_usage,
-            memory_usage
+            memory_usage,
+            tasks_running,
+            tasks_queued,
+            cache_stats["hits"],
+            cache_stats["misses"],
+            cache_stats["size"]
         )
 
+    # How much of the /r/all streams was fetched
+    for objtype, stats in get_feeder_stats().items():
+        coverage = "-"
+        if stats["coverage"] is not None:
+            coverage = "%.1f%%" % (stats["coverage"] * 100)
+
+        reply += """
+    %s requested/skipped/backlog: %s/%s/%s (coverage %s)""" % (
+            FEEDER_NAMES.get(objtype, objtype),
+            stats["requested"],
+            stats["skipped"],
+            stats["drift"],
+            coverage)
+
     message.author.send_pm("System status", reply)
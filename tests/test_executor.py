@@ -0,0 +1,74 @@
+import threading
+import time
+import concurrent.futures
+from modbot.executor import PluginExecutor
+from modbot.ratelimit import priority, request_priority, current_priority
+
+
+def test_plugin_limits():
+    executor = PluginExecutor(workers=4, per_plugin=1, max_queued=1, block_timeout=0.1)
+    # The test backend runs pools in the calling thread, use real threads
+    executor.pool = concurrent.futures.ThreadPoolExecutor(max_workers=4)
+
+    release = threading.Event()
+    done = []
+
+    def task(name):
+        release.wait(5)
+        done.append(name)
+
+    # One task runs, one waits and the queue of the plugin is then full
+    assert executor.submit("slow", task, "a")
+    assert executor.submit("slow", task, "b")
+    assert not executor.submit("slow", task, "c")
+
+    # Other plugins are not held back
+    assert executor.submit("other", done.append, "d")
+
+    stats = executor.stats()["slow"]
+    assert stats["running"] == 1
+    assert stats["queued"] == 1
+    assert stats["dropped"] == 1
+
+    # The waiting task starts when the running one is done
+    release.set()
+    for _ in range(50):
+        if executor.stats()["slow"]["completed"] == 2:
+            break
+        time.sleep(0.1)
+
+    assert sorted(done) == ["a", "b", "d"]
+    assert executor.stats()["slow"]["completed"] == 2
+
+
+def test_submitter_priority():
+    executor = PluginExecutor(workers=1, per_plugin=1, max_queued=1, block_timeout=0.1)
+    executor.pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    levels = []
+    with request_priority(priority.COMMAND):
+        executor.submit("plugin", lambda: levels.append(current_priority()))
+
+    executor.pool.shutdown(wait=True)
+    assert levels == [priority.COMMAND]
+
+
+def test_periodic_runs():
+    executor = PluginExecutor(workers=2, per_plugin=1, max_queued=1, block_timeout=5)
+    executor.pool = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+
+    release = threading.Event()
+
+    # A run is skipped while the previous one with the same key is running
+    assert executor.submit("plugin", release.wait, 5, block=False, key="hook")
+    assert not executor.submit("plugin", release.wait, 5, block=False, key="hook")
+
+    # A full queue drops the task without waiting
+    assert executor.submit("plugin", release.wait, 5)
+    start = time.monotonic()
+    assert not executor.submit("plugin", release.wait, 5, block=False, key="other")
+    assert time.monotonic() - start < 1
+
+    release.set()
+    executor.pool.shutdown(wait=False)
+    assert executor.stats()["plugin"]["dropped"] == 2
@@ -0,0 +1,290 @@
+import pytest
+import base36
+import modbot.input.test as test
+import modbot.reddit_wrapper as reddit_wrapper
+from modbot.storage import get_stored_dict
+
+TEST_SUBREDDIT = "testsub123"
+
+
+@pytest.fixture
+def create_bot():
+    test.create_bot(TEST_SUBREDDIT)
+
+
+def test_resume(create_bot):
+    state = reddit_wrapper.all_data["t3_"]
+    subs = [test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title%d" % i) for i in range(6)]
+
+    # Simulate a stop while the first range was being fetched
+    fed = state["fed"]
+    state["seen"] = fed + 6
+    state["pending"] = fed + 6
+    state["workers"] = [
+        {"start": fed + 1, "end": fed + 3, "finished": 0, "last": fed + 1},
+        {"start": fed + 4, "end": fed + 6, "finished": 1}]
+
+    fed_items = []
+    feeder = reddit_wrapper.BotFeeder(
+        reddit_wrapper.all_data, "t3_", fed_items.append, lambda obj: obj, 2, 3)
+
+    # Nothing is fetched before the current position is known
+    feeder.feed_new_elements()
+    assert fed_items == []
+
+    feeder.set_initial(subs[-1])
+    feeder.feed_new_elements()
+
+    # Only the items that were not fed before the stop are fed
+    assert fed_items == subs[1:3]
+    assert state["fed"] == base36.loads(subs[-1].id)
+    assert list(state["workers"]) == []
+
+
+def test_adapt(create_bot, monkeypatch):
+    feeder = reddit_wrapper.BotFeeder(
+        reddit_wrapper.all_data, "t3_", None, lambda obj: obj, 10, 100,
+        min_workers=2, min_probe_interval=5, max_probe_interval=60)
+    state = feeder.storchild
+
+    # Enough workers to cover the drift
+    state["fed"] = 1000
+    state["seen"] = 1450
+    feeder.adapt()
+    assert feeder.workers_limit == 5
+
+    state["seen"] = 1010
+    feeder.adapt()
+    assert feeder.workers_limit == 2
+
+    # Probe so that each probe finds about a full batch
+    assert feeder.probe_interval == 60
+    feeder.item_rate = 10
+    assert feeder.probe_interval == 10
+    feeder.item_rate = 100
+    assert feeder.probe_interval == 5
+
+    # Slow down when the rate limit is running out
+    monkeypatch.setattr(test, "get_rate_limit", lambda: 0.1)
+    state["seen"] = 5000
+    feeder.adapt()
+    assert feeder.workers_limit == 2
+    assert feeder.probe_interval == 60
+
+
+def test_gaps(create_bot):
+    state = reddit_wrapper.all_data["t3_"]
+    subs = [test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title%d" % i) for i in range(4)]
+
+    # The second submission is not visible yet
+    hidden = test.cache_info.pop("t3_" + subs[1].id)
+
+    fed_items = []
+    feeder = reddit_wrapper.BotFeeder(
+        reddit_wrapper.all_data, "t3_", fed_items.append, lambda obj: obj, 2, 100)
+    feeder.set_initial(subs[-1])
+    feeder.feed_new_elements()
+
+    # The empty ID doesn't stop the other items from being fed
+    assert fed_items == [subs[0], subs[2], subs[3]]
+    assert state["gaps"][0][:2] == [base36.loads(subs[1].id)] * 2
+    assert state["fed"] == base36.loads(subs[-1].id)
+
+    # It is retried once after a while
+    test.cache_info["t3_" + subs[1].id] = hidden
+    test.advance_time(reddit_wrapper.GAP_RETRY_DELAY)
+    feeder.feed_new_elements()
+    assert fed_items[-1] == subs[1]
+    assert list(state["gaps"]) == []
+
+
+def test_fetch_retries(create_bot, monkeypatch):
+    state = reddit_wrapper.all_data["t3_"]
+    subs = [test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title%d" % i) for i in range(3)]
+
+    # Fetching keeps failing
+    calls = []
+
+    def failing_info(info_list):
+        calls.append(info_list)
+        raise RuntimeError("fetch failed")
+
+    monkeypatch.setattr(reddit_wrapper, "FETCH_RETRY_DELAY", 0)
+    monkeypatch.setattr(test.FakePRAW, "info",
+                        lambda self, info_list: failing_info(info_list))
+
+    fed_items = []
+    feeder = reddit_wrapper.BotFeeder(
+        reddit_wrapper.all_data, "t3_", fed_items.append, lambda obj: obj, 3, 100)
+    feeder.set_initial(subs[-1])
+    feeder.feed_new_elements()
+
+    # The range is given up after the retries and left to the gap index
+    assert len(calls) == reddit_wrapper.FETCH_MAX_RETRIES + 1
+    assert fed_items == []
+    assert state["gaps"][0][:2] == [base36.loads(subs[0].id),
+                                    base36.loads(subs[-1].id)]
+    assert state["fed"] == base36.loads(subs[-1].id)
+    assert list(state["workers"]) == []
+
+
+def test_interest_filter(create_bot):
+    other = test.FakeSubmission(
+        subreddit_name="some_other_sub",
+        author_name="JohnDoe1",
+        title="title_test")
+
+    # Nothing is interested in subreddits without hooks
+    assert not test.sub_feeder.item_filter(other)
+
+    # Unless a generic hook becomes active
+    sub = test.get_subreddit(TEST_SUBREDDIT)
+    sub.edit_wiki("control_panel", "[Enabled Plugins]\nword_notifier\n")
+    sub.edit_wiki("word_notifier",
+                  "[Setup]\nword_list = [\"12345\"]\nignore_users = []\n")
+    test.get_reddit().inbox.add_message(
+        "mod1", "/update_control_panel --subreddit %s" % TEST_SUBREDDIT)
+    test.advance_time_60s()
+
+    assert test.sub_feeder.item_filter(other)
+
+
+def test_request_budget(create_bot):
+    fed_items = []
+    feeder = reddit_wrapper.BotFeeder(
+        reddit_wrapper.all_data, "t1_", fed_items.append, lambda obj: obj, 10, 2,
+        request_budget=2)
+    state = feeder.storchild
+
+    sub = test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title")
+    comms = [sub.add_comment("user1", "comment%d" % i) for i in range(8)]
+    feeder.set_initial(comms[0])
+    feeder.new_all_object(comms[-1])
+
+    # Only the newest comments that fit in the budget are fetched
+    feeder.feed_new_elements()
+    assert fed_items == comms[4:]
+    assert state["fed"] == base36.loads(comms[-1].id)
+
+    stats = feeder.stats()
+    assert stats["skipped"] == 3
+    assert stats["requested"] == 4
+    assert stats["coverage"] == 4 / 7
+
+    # No more requests until the budget is renewed
+    comm = sub.add_comment("user1", "comment")
+    feeder.new_all_object(comm)
+    feeder.feed_new_elements()
+    assert fed_items[-1] == comms[-1]
+
+    test.advance_time(60)
+    feeder.feed_new_elements()
+    assert fed_items[-1] == comm
+
+
+def test_moderated_subs(create_bot, monkeypatch):
+    fed_items = []
+    feeder = reddit_wrapper.sub_feeder
+    monkeypatch.setattr(feeder, "callback", fed_items.append)
+    monkeypatch.setattr(feeder, "objclass", lambda obj: obj)
+    monkeypatch.setattr(feeder, "item_filter", None)
+
+    # The first read only sets the cursor
+    test.poll_moderated_subs()
+    assert fed_items == []
+
+    subs = [test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title%d" % i) for i in range(2)]
+    test.poll_moderated_subs()
+    assert fed_items == subs
+
+    # Items are not fed again when /r/all gets to them
+    feeder.new_all_object(subs[-1])
+    feeder.feed_new_elements()
+    assert fed_items == subs
+    assert feeder.stats()["duplicates"] == 2
+
+
+def test_subreddit_cursor(create_bot):
+    assert reddit_wrapper.SubredditPoller.group(["b" * 600, "c", "a" * 600]) == \
+        ["a" * 600, "b" * 600 + "+c"]
+
+    # The cursor was removed, so reads from it return nothing
+    def fetch(name, before):
+        if before:
+            return []
+        return test.get_subreddit_new(name)
+
+    fed_items = []
+    poller = reddit_wrapper.SubredditPoller(fed_items.append, fetch)
+    poller.poll([TEST_SUBREDDIT])
+
+    sub = test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title")
+    for _ in range(reddit_wrapper.SUBREDDIT_CURSOR_CHECK):
+        poller.poll([TEST_SUBREDDIT])
+    assert fed_items == []
+
+    # The newest items are read without cursor
+    poller.poll([TEST_SUBREDDIT])
+    assert fed_items == [sub]
+    assert poller.cursors[TEST_SUBREDDIT]["before"] == sub.fullname
+
+
+def test_modlog_reader(create_bot, monkeypatch):
+    storage = get_stored_dict("test", "modlog")
+    # Entries stored by older versions are replaced with their newest time
+    storage["old"] = test.utils.utcnow()
+    test.advance_time(10)
+
+    sub = test.get_subreddit(TEST_SUBREDDIT)
+
+    def add_entries(nb):
+        entries = [test.FakeModLog("mod1", "user1", "test", None, None, sub)
+                   for _ in range(nb)]
+        test.modlog_entries.extend(entries)
+        return entries
+
+    fed_items = []
+    entries = add_entries(3)
+    reader = reddit_wrapper.ModlogReader("mod", storage, test.get_modlog)
+    assert "old" not in storage
+
+    reader.read(fed_items.append)
+    assert fed_items == entries
+
+    # New entries are read page by page, from the cursor
+    monkeypatch.setattr(reddit_wrapper, "MODLOG_PAGE_SIZE", 2)
+    entries += add_entries(3)
+    reader.read(fed_items.append)
+    assert fed_items == entries
+
+    # The cursor is kept after a restart
+    reader = reddit_wrapper.ModlogReader("mod", storage, test.get_modlog)
+    reader.read(fed_items.append)
+    assert fed_items == entries
+    assert storage["newest"] == entries[-1].id
+
+    # The cursor is gone, so the newest entries are read without it
+    test.modlog_entries.clear()
+    test.advance_time(10)
+    entries += add_entries(1)
+    for _ in range(reddit_wrapper.MODLOG_CURSOR_CHECK + 1):
+        reader.read(fed_items.append)
+    assert fed_items == entries
@@ -0,0 +1,61 @@
+import pytest
+import modbot.input.test as test
+from modbot.utils import timedata
+
+TEST_SUBREDDIT = "testsub123"
+enable_queue_cleaner = """
+[Enabled Plugins]
+queue_cleaner
+"""
+
+
+@pytest.fixture
+def create_bot():
+    test.create_bot(TEST_SUBREDDIT)
+
+
+def test_queue_cleaner(create_bot):
+    wiki_queue_cleaner = """
+    [remove_unactioned_submissions]
+    type = "submission"
+    details = "old"
+    action = "remove"
+    age_days = 1
+    max_reports = 2
+    max_comments = 10
+    """
+    sub = test.get_subreddit(TEST_SUBREDDIT)
+
+    sub.edit_wiki("control_panel", enable_queue_cleaner)
+    sub.edit_wiki("queue_cleaner", wiki_queue_cleaner)
+
+    # Tell the bot to update the control panel
+    test.get_reddit().inbox.add_message(
+        "mod1", "/update_control_panel --subreddit %s" % TEST_SUBREDDIT)
+    test.advance_time_60s()
+
+    old = test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title_test")
+    reported = test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title_test")
+    reported.report("spam")
+    reported.report("spam")
+    sub.add_to_modqueue(old)
+    sub.add_to_modqueue(reported)
+
+    # Too new to be removed
+    test.scan_modqueue()
+    test.advance_time_10m()
+    assert not old.deleted
+
+    # Items are checked again once they are a day older
+    test.advance_time(timedata.SEC_IN_DAY)
+    test.scan_modqueue()
+    test.advance_time_10m()
+    assert old.deleted
+    assert not reported.deleted
+    assert sub.modqueue == [reported]
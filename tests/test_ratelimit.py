@@ -0,0 +1,44 @@
+import threading
+from modbot.ratelimit import RequestScheduler, priority, request_priority, current_priority
+
+
+def test_scheduler():
+    now = [0]
+    sched = RequestScheduler(get_time=lambda: now[0])
+
+    # Nothing is deferred until the quota is known
+    assert sched.headroom() is None
+    sched.acquire(priority.CATCH_UP)
+
+    sched.update_from_headers({
+        "x-ratelimit-remaining": "20",
+        "x-ratelimit-used": "80",
+        "x-ratelimit-reset": "60"})
+    assert sched.headroom() == 0.2
+
+    # Less important work is shed first
+    assert sched.should_shed(priority.CATCH_UP)
+    assert not sched.should_shed(priority.REPORTS)
+    with request_priority(priority.CATCH_UP):
+        assert current_priority() == priority.CATCH_UP
+        assert sched.should_shed()
+    assert current_priority() == priority.DEFAULT
+
+    # Each request counts until the next response
+    sched.acquire(priority.COMMAND)
+    assert sched.remaining == 19
+
+    # Deferred requests go through once the quota is reset
+    done = threading.Event()
+
+    def deferred():
+        sched.acquire(priority.CATCH_UP)
+        done.set()
+
+    thread = threading.Thread(target=deferred)
+    thread.start()
+    assert not done.wait(0.2)
+
+    now[0] = 61
+    assert done.wait(5)
+    thread.join()
@@ -0,0 +1,63 @@
+import time
+import threading
+import praw
+import modbot.input.reddit_async as reddit_async
+
+
+def test_poll_loop(monkeypatch):
+    monkeypatch.setitem(reddit_async.schedules, "modqueue", 0.01)
+
+    scans = []
+    ticks = []
+    done = threading.Event()
+
+    def scan():
+        scans.append(threading.current_thread().name)
+
+    def trigger(tnow):
+        ticks.append(tnow)
+        if len(ticks) == 3:
+            done.set()
+            raise ValueError("errors don't stop the poller")
+
+    # All pollers share one loop
+    reddit_async.thread_modqueue(scan)
+    reddit_async.tick(0.01, trigger)
+    assert reddit_async.get_poll_loop() is reddit_async.poll_loop
+
+    assert done.wait(5)
+    time.sleep(0.1)
+    reddit_async.stop_poll_loop()
+    assert len(ticks) > 3
+    assert len(scans) > 3
+
+    # Blocking calls don't run in the loop thread
+    assert all(name.startswith("poll") for name in scans)
+
+    # Nothing runs once the loop is stopped
+    time.sleep(0.1)
+    nb_scans = len(scans)
+    time.sleep(0.1)
+    assert len(scans) == nb_scans
+
+
+def test_session_reset(monkeypatch):
+    monkeypatch.setitem(reddit_async.schedules, "modqueue", 0.01)
+
+    resets = []
+    done = threading.Event()
+
+    def get_reddit(name="default", force_create=False):
+        resets.append((name, force_create))
+        done.set()
+
+    def scan():
+        raise praw.exceptions.PRAWException("scan failed")
+
+    monkeypatch.setattr(reddit_async, "get_reddit", get_reddit)
+
+    # The modqueue is read with the default session, which is created again
+    reddit_async.thread_modqueue(scan)
+    assert done.wait(5)
+    reddit_async.stop_poll_loop()
+    assert resets[0] == ("default", True)
@@ -1,5 +1,6 @@
 import pytest
 import modbot.input.test as test
+import modbot.reddit_wrapper as reddit_wrapper
 
 TEST_SUBREDDIT = "testsub123"
 enable_flair_posts = """
@@ -70,6 +71,40 @@ def test_repost_detector(create_bot):
     assert(len(test_submission4.reports) == 0)
 
 
+def test_removed_original(create_bot, monkeypatch):
+    wiki_flair_posts = """
+    [Setup]
+    minimum_word_length = 3
+    minimum_nb_words = 5
+    min_overlap_percent = 50
+    """
+    sub = test.get_subreddit(TEST_SUBREDDIT)
+    sub.edit_wiki("control_panel", enable_flair_posts)
+    sub.edit_wiki("repost_detector", wiki_flair_posts)
+    test.get_reddit().inbox.add_message(
+        "mod1", "/update_control_panel --subreddit %s" % TEST_SUBREDDIT)
+    test.advance_time_60s()
+
+    # Keep items in the cache for the whole test
+    monkeypatch.setitem(reddit_wrapper.cache_opts, "submission_ttl", 10 ** 6)
+
+    original = test.FakeSubmission(subreddit_name=TEST_SUBREDDIT, author_name="JohnDoe1",
+                                   title="AAAA BBBB CCCC DDDD EEEE FFFF")
+    test.advance_time_30m()
+
+    repost = test.FakeSubmission(subreddit_name=TEST_SUBREDDIT, author_name="JohnDoe1",
+                                 title="AAAA BBBB CCCC DDDD EEEE GGGG")
+    test.advance_time_10m()
+    assert len(repost.reports) == 1
+
+    # The removal is seen even though the original is cached
+    original.delete_by_mod()
+    repost = test.FakeSubmission(subreddit_name=TEST_SUBREDDIT, author_name="JohnDoe1",
+                                 title="AAAA BBBB CCCC DDDD EEEE HHHH")
+    test.advance_time_10m()
+    assert len(repost.reports) == 0
+
+
 def test_invalid_cfg(create_bot):
     wiki_flair_posts = """
     [Seup]
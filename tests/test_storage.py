@@ -1,9 +1,16 @@
 import threading
+import sqlite3
 import sys
 import time
+import os
+import json
 from os.path import dirname as d
 from os.path import abspath, join
-from modbot.storage import dsdict
+from modbot.storage import dsdict, dsjournal, flush_all, set_storage_loc, \
+    deferred_writes
+from modbot.storage_sqlite import sqlitedict, close_all
+from modbot.storage_lazy import dslazy
+import modbot.storage_lazy as storage_lazy
 
 import pytest
 
@@ -44,3 +51,310 @@ def test_stor():
         if not keep_going:
             break
         time.sleep(0.1)
+
+
+def test_write_behind(tmp_path):
+    set_storage_loc(str(tmp_path) + "/")
+
+    test_dict = dsdict("test", "write_behind", write_behind=3600)
+    test_dict["test"] = 1
+    test_dict["test"] = 2
+
+    # Nothing is written until the object is flushed
+    assert not os.path.isfile(test_dict.location)
+
+    flush_all()
+    assert json.load(open(test_dict.location)) == {"test": 2}
+    assert not os.path.isfile(test_dict.location + ".tmp")
+
+    # Only objects that are due are written by the flusher
+    test_dict["test"] = 3
+    flush_all(only_due=True)
+    assert json.load(open(test_dict.location)) == {"test": 2}
+
+    test_dict.flush()
+    assert json.load(open(test_dict.location)) == {"test": 3}
+
+
+def test_sqlite_backend(tmp_path):
+    set_storage_loc(str(tmp_path) + "/")
+
+    # Create a JSON file that should be imported
+    json_dict = dsdict("sub", "plugin")
+    json_dict["subs"] = {"a": 1}
+
+    sql_dict = sqlitedict("sub", "plugin")
+    assert sql_dict["subs"] == {"a": 1}
+
+    # Nested changes are written without calling sync
+    sql_dict["subs"]["b"] = 2
+    sql_dict["other"] = 3
+    del sql_dict["other"]
+
+    # Later changes to the JSON file are not imported again
+    json_dict["subs"] = {}
+
+    assert dict(sqlitedict("sub", "plugin")) == {"subs": {"a": 1, "b": 2}}
+
+    # Stores that only have a backup are imported from it
+    json_dict = dsdict("sub", "backup_only")
+    json_dict["subs"] = {"a": 1}
+    json_dict["subs"]["b"] = 2
+    os.remove(json_dict.location)
+
+    assert dict(sqlitedict("sub", "backup_only")) == {"subs": {"a": 1}}
+    close_all()
+
+
+def test_sqlite_rows(tmp_path, monkeypatch):
+    set_storage_loc(str(tmp_path) + "/")
+
+    sql_dict = sqlitedict("sub", "rows")
+    sql_dict["subs"] = {str(i): {"nb": i} for i in range(100)}
+    sql_dict["count"] = 1
+
+    written = []
+    conn = sql_dict.conn
+    executebatch = conn.executebatch
+
+    def record(batch):
+        written.extend(row for _, rows in batch for row in rows)
+        executebatch(batch)
+    monkeypatch.setattr(conn, "executebatch", record)
+
+    # Changing a nested item only writes its row
+    sql_dict["subs"]["new"] = {"nb": 100}
+    assert written == [("sub", "rows", "subs", '"new"', '{"nb": 100}')]
+
+    written.clear()
+    sql_dict["subs"]["1"]["nb"] = 10
+    del sql_dict["subs"]["0"]
+    assert written == [("sub", "rows", "subs", '"1"', '{"nb": 10}'),
+                       ("sub", "rows", "subs", '"0"')]
+
+    # Values that are replaced as a whole only write the changed items
+    written.clear()
+    sql_dict["subs"] = dict(sql_dict["subs"], other={"nb": 0})
+    assert written == [("sub", "rows", "subs", '"other"', '{"nb": 0}')]
+
+    expected = dict(sql_dict)
+    close_all()
+    reloaded = sqlitedict("sub", "rows")
+    assert dict(reloaded) == expected
+    assert reloaded["subs"]["1"] == {"nb": 10}
+    assert "0" not in reloaded["subs"]
+    close_all()
+
+
+def test_sqlite_upgrade(tmp_path):
+    set_storage_loc(str(tmp_path) + "/")
+
+    # Databases with one row per top level key are still read
+    conn = sqlite3.connect(str(tmp_path / "storage.db"))
+    conn.execute("CREATE TABLE kv (parent TEXT, name TEXT, key TEXT, "
+                 "value TEXT, PRIMARY KEY (parent, name, key))")
+    conn.execute("CREATE TABLE migrated (parent TEXT, name TEXT, "
+                 "PRIMARY KEY (parent, name))")
+    conn.execute("INSERT INTO kv VALUES ('sub', 'old', 'subs', '{\"a\": 1}')")
+    conn.execute("INSERT INTO migrated VALUES ('sub', 'old')")
+    conn.commit()
+    conn.close()
+
+    sql_dict = sqlitedict("sub", "old")
+    assert sql_dict["subs"] == {"a": 1}
+
+    sql_dict["subs"]["b"] = 2
+    del sql_dict["subs"]["a"]
+    close_all()
+    assert dict(sqlitedict("sub", "old")) == {"subs": {"b": 2}}
+    close_all()
+
+
+def test_journal(tmp_path):
+    set_storage_loc(str(tmp_path) + "/")
+
+    test_dict = dsjournal("test", "journal")
+    test_dict["subs"] = {"a": 1}
+    test_dict["subs"]["b"] = 2
+    test_dict["other"] = 1
+    del test_dict["other"]
+
+    # Changes are only in the journal until it's compacted
+    assert not os.path.isfile(test_dict.location)
+    assert dict(dsjournal("test", "journal")) == {"subs": {"a": 1, "b": 2}}
+
+    test_dict.compact()
+    test_dict["subs"] = {}
+    assert json.load(open(test_dict.location)) == {"subs": {"a": 1, "b": 2}}
+    assert dict(dsjournal("test", "journal")) == {"subs": {}}
+
+
+def test_nested_tracking(tmp_path):
+    set_storage_loc(str(tmp_path) + "/")
+
+    test_dict = dsdict("test", "tracking")
+    test_dict["subs"] = {}
+
+    # Values handed out by the storage report their changes
+    test_dict["subs"]["a"] = {"list": []}
+    test_dict["subs"]["a"]["list"].append({"b": 1})
+    test_dict["subs"]["a"]["list"][0]["b"] = 2
+    assert json.load(open(test_dict.location)) == \
+        {"subs": {"a": {"list": [{"b": 2}]}}}
+
+    # Changes made in a batch are written once
+    writes = []
+    test_dict.persist_keys = writes.append
+    with test_dict.batch():
+        test_dict["subs"]["c"] = 1
+        del test_dict["subs"]["a"]
+        test_dict["other"] = []
+    # The changed nested keys are passed along
+    assert writes == [{"subs": {"a", "c"}, "other": None}]
+
+    # Stored values are copies, changes to the original are not seen
+    writes.clear()
+    value = {}
+    test_dict["copied"] = value
+    value["a"] = 1
+    assert writes == [{"copied": None}]
+    assert test_dict["copied"] == {}
+
+    test_dict["copied"]["a"] = 1
+    assert writes[-1] == {"copied": {"a"}}
+
+
+def test_deferred_writes(tmp_path):
+    set_storage_loc(str(tmp_path) + "/")
+
+    first = dsdict("test", "deferred1")
+    second = dsdict("test", "deferred2")
+    first["subs"] = {}
+
+    # Each object is written once, when the outer block ends
+    writes = []
+    first.persist_keys = lambda changes: writes.append(("first", changes))
+    second.persist_keys = lambda changes: writes.append(("second", changes))
+    with deferred_writes():
+        for i in range(10):
+            first["subs"][i] = i
+
+        with deferred_writes():
+            second["other"] = []
+            second["other"].append(1)
+        assert writes == []
+
+    assert sorted(writes, key=lambda write: write[0]) == [
+        ("first", {"subs": set(range(10))}), ("second", {"other": None})]
+
+    # Outside of the block, changes are written right away
+    writes.clear()
+    first["subs"][10] = 10
+    assert writes == [("first", {"subs": {10}})]
+
+
+def test_serializers(tmp_path):
+    set_storage_loc(str(tmp_path) + "/")
+
+    pretty = dsdict("test", "serializer")
+    pretty["subs"] = {"a": [1, 2]}
+    assert "\n" in open(pretty.location).read()
+
+    # The compact file can be read back by any JSON serializer
+    compact = dsdict("test", "serializer", serializer="compact")
+    assert dict(compact) == {"subs": {"a": [1, 2]}}
+    compact.sync()
+    assert open(compact.location).read() == '{"subs":{"a":[1,2]}}'
+
+    with pytest.raises(ValueError):
+        dsdict("test", "serializer", serializer="invalid")
+
+
+def test_expiring(tmp_path):
+    set_storage_loc(str(tmp_path) + "/")
+
+    test_dict = dsdict("test", "expiring")
+    test_dict["subs"] = {"old": {"created_utc": 0}}
+    subs = test_dict.expiring(10, lambda post: post["created_utc"], "subs")
+
+    # The same map is handed out for the same dictionary
+    assert test_dict.expiring(10, key="subs") is subs
+
+    subs["new"] = {"created_utc": 5}
+    subs["moved"] = {"created_utc": 1}
+    subs["moved"]["created_utc"] = 8
+
+    assert subs.expire(12) == ["old"]
+    assert subs.expire(16) == ["new"]
+    assert json.load(open(test_dict.location)) == \
+        {"subs": {"moved": {"created_utc": 8}}}
+
+    # Values are the timestamps by default
+    hist = dsdict("test", "history")
+    hist["a"] = 1
+    hist["b"] = 15
+    assert hist.expiring(10).expire(20) == ["a"]
+    assert dict(dsdict("test", "history")) == {"b": 15}
+
+
+def test_lazy(tmp_path):
+    set_storage_loc(str(tmp_path) + "/")
+
+    # Existing JSON files are imported
+    old = dsdict("test", "lazy")
+    old["a"] = {"content": "wiki"}
+
+    test_dict = dslazy("test", "lazy", cache_size=2)
+    assert dict(test_dict) == {"a": {"content": "wiki"}}
+
+    for i in range(5):
+        test_dict[str(i)] = {"nb": i}
+    test_dict["0"]["nb"] = 10
+    del test_dict["1"]
+    assert len(test_dict.cache) == 2
+
+    # Values are only decoded when accessed
+    reloaded = dslazy("test", "lazy", cache_size=2)
+    assert len(reloaded.cache) == 0
+    assert reloaded["0"] == {"nb": 10}
+    assert "1" not in reloaded
+    assert sorted(reloaded) == ["0", "2", "3", "4", "a"]
+
+    # Stale values are dropped when the data file is compacted
+    reloaded["a"] = {}
+    reloaded.compact()
+    assert reloaded.data_size == reloaded.live_size
+    assert dict(dslazy("test", "lazy")) == \
+        {"0": {"nb": 10}, "2": {"nb": 2}, "3": {"nb": 3},
+         "4": {"nb": 4}, "a": {}}
+
+    # Files that only have a backup are imported from it
+    old = dsdict("test", "lazy_backup")
+    old["a"] = 1
+    old["b"] = 2
+    os.remove(old.location)
+    assert dict(dslazy("test", "lazy_backup")) == {"a": 1}
+
+
+def test_lazy_evicted_changes(tmp_path, monkeypatch):
+    set_storage_loc(str(tmp_path) + "/")
+
+    test_dict = dslazy("test", "evicted", write_behind=0, cache_size=1)
+    test_dict["a"] = {"list": []}
+    held = test_dict["a"]["list"]
+
+    # "a" is dropped from memory, but the list is still changed by its holder
+    test_dict["b"] = {}
+    assert "a" not in test_dict.cache
+    held.append(1)
+
+    # Positions are appended to the index log instead of rewriting the index
+    assert test_dict.log_entries > 0
+    assert dict(dslazy("test", "evicted")) == {"a": {"list": [1]}, "b": {}}
+
+    # The log is merged in the index once it's larger than the index
+    monkeypatch.setattr(storage_lazy, "INDEX_LOG_MIN_ENTRIES", 2)
+    test_dict["c"] = 1
+    assert test_dict.log_entries == 0
+    del test_dict["b"]
+    assert dict(dslazy("test", "evicted")) == {"a": {"list": [1]}, "c": 1}
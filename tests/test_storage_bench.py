@@ -0,0 +1,32 @@
+import time
+from modbot.storage import dsdict, set_storage_loc, SERIALIZERS
+
+import pytest
+
+NB_KEYS = 10000
+NB_WRITES = 5
+
+
+def write_throughput(serializer):
+    test_dict = dsdict("bench", serializer, serializer=serializer)
+    for i in range(NB_KEYS):
+        test_dict.data["t3_%d" % i] = {"sub": "test", "created": i}
+
+    tstart = time.perf_counter()
+    for _ in range(NB_WRITES):
+        test_dict.flush()
+
+    return NB_WRITES / (time.perf_counter() - tstart)
+
+
+@pytest.mark.parametrize("serializer", sorted(SERIALIZERS.keys()))
+def test_write_throughput(tmp_path, serializer):
+    """
+    Compare how many times per second a 10k key dictionary can be written
+    """
+    set_storage_loc(str(tmp_path) + "/")
+
+    throughput = write_throughput(serializer)
+    print("%s: %.1f writes/s for %d keys" % (serializer, throughput, NB_KEYS))
+
+    assert throughput > 0
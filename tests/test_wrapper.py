@@ -0,0 +1,254 @@
+import pytest
+import modbot.input.test as test
+import modbot.reddit_wrapper as reddit_wrapper
+from modbot.hook import plugin_function, callback_type
+from modbot.moderated_sub import DispatchAll
+
+TEST_SUBREDDIT = "testsub123"
+
+
+@pytest.fixture
+def create_bot():
+    test.create_bot(TEST_SUBREDDIT)
+
+
+def test_snapshot(create_bot):
+    raw = test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title",
+        body="body")
+    sub = reddit_wrapper.submission(raw)
+
+    assert sub.title == "title"
+    assert sub.author.name == "JohnDoe1"
+    assert sub.num_comments == 0
+
+    with pytest.raises(AttributeError):
+        sub.snapshot.title = "other"
+
+    # Changes are only seen after a refresh
+    raw.edit("new body")
+    raw.add_comment("user1", "comment")
+    assert sub.selftext == "body"
+
+    sub.refresh()
+    assert sub.selftext == "new body"
+    assert sub.num_comments == 1
+
+
+def test_snapshot_fetch_error(create_bot):
+    class LazyItem():
+        fail = True
+
+        def __getattr__(self, name):
+            # Fetching the item fails, otherwise the field is missing
+            if self.fail:
+                raise RuntimeError("fetch failed")
+            raise AttributeError(name)
+
+    raw = LazyItem()
+
+    # A failed fetch is not turned into an empty snapshot
+    with pytest.raises(RuntimeError):
+        reddit_wrapper.SubmissionSnapshot(raw)
+
+    # Fields missing from the item default to None
+    raw.fail = False
+    snapshot = reddit_wrapper.SubmissionSnapshot(raw)
+    assert snapshot.title is None
+
+
+def test_get_items(create_bot):
+    raw = test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title",
+        body="body")
+    comm = raw.add_comment("user1", "comment")
+
+    items = reddit_wrapper.get_items(
+        [raw.shortlink, "t1_" + comm.id, "t3_missing"])
+
+    # Items that were not found are left out
+    assert sorted(items.keys()) == sorted([raw.shortlink, "t1_" + comm.id])
+    assert isinstance(items[raw.shortlink], reddit_wrapper.submission)
+    assert items["t1_" + comm.id].body == "comment"
+
+
+def test_thing_cache(create_bot):
+    raw = test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title",
+        body="body")
+    stats = reddit_wrapper.get_cache_stats()
+
+    sub = reddit_wrapper.get_submission(raw.shortlink)
+    assert reddit_wrapper.get_items([raw.shortlink])[raw.shortlink] is sub
+    assert reddit_wrapper.get_cache_stats()["hits"] == stats["hits"] + 1
+    assert reddit_wrapper.get_cache_stats()["misses"] == stats["misses"] + 1
+
+    # Changes made by the bot drop the cached copy
+    sub.make_sticky()
+    assert reddit_wrapper.get_submission(raw.shortlink).stickied
+
+    # Other changes are seen once the cached copy expires
+    raw.edit("new body")
+    assert reddit_wrapper.get_submission(raw.shortlink).selftext == "body"
+
+    # Fresh reads skip the cache and update it
+    assert reddit_wrapper.get_items([raw.shortlink], fresh=True)[raw.shortlink].selftext == "new body"
+    assert reddit_wrapper.get_submission(raw.shortlink).selftext == "new body"
+
+    raw.edit("newer body")
+    test.advance_time(reddit_wrapper.cache_opts["submission_ttl"] + 1)
+    assert reddit_wrapper.get_submission(raw.shortlink).selftext == "newer body"
+
+
+def test_modqueue_tracker(create_bot, monkeypatch):
+    queue = []
+    for i in range(3):
+        raw = test.FakeSubmission(
+            subreddit_name=TEST_SUBREDDIT,
+            author_name="JohnDoe1",
+            title="title%d" % i)
+        queue.insert(0, raw)
+
+    fetched = []
+
+    def fetch(target):
+        for raw in queue:
+            fetched.append(raw)
+            yield raw
+
+    tracker = reddit_wrapper.ModqueueTracker(TEST_SUBREDDIT, fetch)
+    assert len(tracker.scan()) == 3
+
+    # Only the changed item is returned
+    queue[1].report("spam")
+    changed = tracker.scan()
+    assert [item.target_fullname for item in changed] == [queue[1].fullname]
+
+    # Incremental scans stop after enough unchanged items
+    monkeypatch.setattr(reddit_wrapper, "MODQUEUE_KNOWN_STOP", 1)
+    fetched.clear()
+    queue.pop()
+    assert tracker.scan() == []
+    assert fetched == [queue[0]]
+    assert len(tracker.tracked()) == 3
+
+    # Full scans drop the items that left the queue
+    assert tracker.scan(full=True) == []
+    assert len(tracker.tracked()) == 2
+
+    # Items are checked again once they are a day older
+    test.advance_time(reddit_wrapper.timedata.SEC_IN_DAY)
+    assert len(tracker.scan(full=True)) == 2
+
+
+def test_scan_modqueue(create_bot, monkeypatch):
+    sub = test.get_subreddit(TEST_SUBREDDIT)
+    items = [test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title%d" % i) for i in range(2)]
+    for raw in items:
+        sub.add_to_modqueue(raw)
+
+    fed = []
+    monkeypatch.setattr(
+        reddit_wrapper, "modqueue_feeder",
+        lambda item, changed: fed.append((item.target_fullname, changed)))
+
+    # Every item is fed on each pass, newest first
+    reddit_wrapper.scan_modqueue()
+    assert fed == [(items[1].fullname, True), (items[0].fullname, True)]
+
+    fed.clear()
+    items[0].report("spam")
+    reddit_wrapper.scan_modqueue()
+    assert fed == [(items[1].fullname, False), (items[0].fullname, True)]
+
+
+def test_modqueue_changed_only(create_bot):
+    calls = []
+    container = DispatchAll.HookContainer(
+        lambda func, with_thread, args: calls.append(func.name))
+
+    def every_item(modqueue):
+        pass
+
+    def changed_item(modqueue):
+        pass
+
+    container.add_hook(plugin_function(
+        every_item, callback_type.MQU, None, "plugins/every.py"))
+    container.add_hook(plugin_function(
+        changed_item, callback_type.MQU, {"changed_only": True},
+        "plugins/changed.py"))
+
+    # Hooks that only want changes skip the unchanged items
+    container.run_modqueue(None, {}, changed=False)
+    assert calls == ["every_item"]
+
+    calls.clear()
+    container.run_modqueue(None, {}, changed=True)
+    assert calls == ["every_item", "changed_item"]
+
+
+def test_report_tracker(create_bot, monkeypatch):
+    subs = [test.FakeSubmission(
+        subreddit_name=TEST_SUBREDDIT,
+        author_name="JohnDoe1",
+        title="title%d" % i) for i in range(3)]
+
+    fetched = []
+
+    def fetch(target):
+        for raw in test.get_all_reports(target):
+            fetched.append(raw)
+            yield raw
+
+    tracker = reddit_wrapper.ReportTracker(TEST_SUBREDDIT, fetch)
+    for sub in subs:
+        sub.report("/cmd", "mod1")
+    assert len(tracker.scan()) == 3
+
+    # Only the new reports are returned
+    test.advance_time(1)
+    subs[0].report("/other", "mod2")
+    subs[0].report("spam")
+    assert tracker.scan() == [(subs[0], "mod2", "/other")]
+
+    # Incremental scans stop after enough unchanged items
+    monkeypatch.setattr(reddit_wrapper, "REPORTS_KNOWN_STOP", 1)
+    fetched.clear()
+    assert tracker.scan() == []
+    assert fetched == [subs[0]]
+
+    # Full scans drop the items that are no longer reported
+    subs[1].reports.clear()
+    assert tracker.scan(full=True) == []
+    assert sorted(tracker.items) == sorted([subs[0].fullname, subs[2].fullname])
+
+
+def test_read_inbox(create_bot, monkeypatch):
+    fed = []
+    monkeypatch.setattr(reddit_wrapper, "inbox_feeder", fed.append)
+    monkeypatch.setattr(reddit_wrapper, "INBOX_MARK_READ_BATCH", 2)
+
+    inbox = test.get_reddit().inbox
+    for author, body in [("user1", "a"), ("user2", "b"), ("user1", "c"),
+                         ("user2", "d"), ("user1", "e")]:
+        inbox.add_message(author, body)
+
+    calls = inbox.mark_read_calls
+    reddit_wrapper.read_inbox()
+
+    # Messages are marked as read in batches
+    assert inbox.mark_read_calls - calls == 3
+    assert all(msg.read for msg in inbox.messages)
+
+    # Messages of an author are run in order
+    assert [msg.body for msg in fed] == ["a", "c", "e", "b", "d"]